@@ -0,0 +1,154 @@
+"""
+Fixtures and helpers for the benchmark suite.
+
+The benchmarks run against the MariaDB container of the test suite, started
+on demand, or against the server given in the environment variable
+DBREQUESTS_BENCHMARK_URL, e.g. 'mysql+{driver}://root:root@localhost/test'.
+The row counts can be set with DBREQUESTS_BENCHMARK_ROWS, e.g. '10000,100000'.
+The benchmarks in test_client.py need no server, they use the protocol stub of
+mysql_stub.py to measure the client side only. test_latency.py guards the
+overhead per call against SQLite and the import time, also without a server;
+CI runs it in a separate step.
+
+Run them with:
+
+    pytest benchmarks --benchmark-autosave
+
+and compare with an earlier run with `--benchmark-compare`.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from dbrequests.instrumentation import current_rss
+from dbrequests.mysql import Database
+
+ROWS = [int(n) for n in os.environ.get('DBREQUESTS_BENCHMARK_ROWS', '10000,100000,1000000').split(',')]
+DRIVERS = ['pymysql', 'mysqldb']
+TYPES = {
+    'int': 'id INT NOT NULL, a INT NOT NULL, b INT NOT NULL',
+    'str': 'id INT NOT NULL, a VARCHAR(16) NOT NULL, b VARCHAR(16) NOT NULL',
+    'mixed': 'id INT NOT NULL, a VARCHAR(16) NOT NULL, b DOUBLE NOT NULL, c DATE NOT NULL',
+}
+
+
+@pytest.fixture(scope='session')
+def server():
+    """The url of the server, starts a container if none is configured."""
+    url = os.environ.get('DBREQUESTS_BENCHMARK_URL')
+    if url is not None:
+        yield url
+        return None
+    from dbrequests.mysql.tests.conftest import CREDS, kill_remove_docker_container, run_docker_container
+
+    container = run_docker_container()
+    try:
+        yield 'mysql+{{driver}}://{user}:{password}@{host}:{port}/{db}'.format(**CREDS)
+    finally:
+        kill_remove_docker_container(container)
+
+
+@pytest.fixture(scope='session', params=DRIVERS)
+def db(request, server):
+    """A Database for each driver."""
+    pytest.importorskip({'pymysql': 'pymysql', 'mysqldb': 'MySQLdb'}[request.param])
+    db = Database(server.format(driver=request.param))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope='session')
+def stub():
+    """The MySQL protocol stub, see mysql_stub.py."""
+    from .mysql_stub import MysqlStub
+
+    with MysqlStub() as stub:
+        yield stub
+
+
+@pytest.fixture(scope='session', params=DRIVERS)
+def stub_db(request, stub):
+    """A Database on the stub for each driver."""
+    pytest.importorskip({'pymysql': 'pymysql', 'mysqldb': 'MySQLdb'}[request.param])
+    db = Database(stub.url(request.param))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def make_frame(rows, types, seed=0):
+    """Synthetic data with a primary key 'id', generated without python loops."""
+    from datatable import Frame
+
+    rng = np.random.default_rng(seed)
+    columns = {'id': np.arange(rows, dtype=np.int32)}
+    if types == 'int':
+        columns['a'] = rng.integers(0, 100000, rows, dtype=np.int32)
+        columns['b'] = rng.integers(0, 2, rows, dtype=np.int32)
+    elif types == 'str':
+        columns['a'] = np.char.mod('%08x', rng.integers(0, 2 ** 31, rows))
+        columns['b'] = np.char.mod('s%d', rng.integers(0, 100, rows))
+    else:
+        columns['a'] = np.char.mod('%08x', rng.integers(0, 2 ** 31, rows))
+        columns['b'] = rng.random(rows)
+        columns['c'] = np.datetime64('2020-01-01') + rng.integers(0, 3650, rows).astype('timedelta64[D]')
+    return Frame({name: values.tolist() if values.dtype.kind in 'UM' else values for name, values in columns.items()})
+
+
+def create_table(db, table, types, primary_key=True):
+    """(Re)create table with the columns of types."""
+    db.send_bulk_query('drop table if exists `{}`;'.format(table))
+    db.send_bulk_query(
+        'create table `{table}` ({columns}{key}) engine=InnoDB default charset=utf8mb4;'.format(
+            table=table, columns=TYPES[types], key=', primary key (`id`)' if primary_key else ''
+        )
+    )
+
+
+class PeakMemory(object):
+    """Samples the resident set size in a thread; `peak` is the increase."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self._start = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._done.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, current_rss() - self._start)
+            time.sleep(self.interval)
+
+
+def run(benchmark, function, rows, setup=None, rounds=3):
+    """
+    Benchmark function and record throughput and peak memory.
+
+    setup is called before every round and is not measured.
+    """
+    def target():
+        with PeakMemory() as memory:
+            function()
+        peaks.append(memory.peak)
+
+    peaks = []
+    benchmark.pedantic(target, setup=setup, rounds=rounds, iterations=1)
+    benchmark.extra_info['rows'] = rows
+    benchmark.extra_info['peak_memory'] = max(peaks)
+    # With --benchmark-disable the function runs once and is not timed.
+    if benchmark.stats is not None:
+        benchmark.extra_info['rows_per_second'] = rows / benchmark.stats.stats.mean
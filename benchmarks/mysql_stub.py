@@ -0,0 +1,371 @@
+"""
+An in-process stand-in for a MySQL server, speaking the client/server protocol.
+
+It answers the handshake for any user and password, the statements sqlalchemy
+and dbrequests send when connecting or sending data, result sets of synthetic
+data and LOAD DATA LOCAL INFILE requests. There is no storage: statements
+which do not return rows are acknowledged with OK.
+
+The server side costs are negligible, rows are encoded once per table and
+uploaded files are only counted, so benchmarks against the stub measure the
+client side: fetching and converting rows, writing and sending CSV files.
+
+    with MysqlStub() as stub:
+        db = Database(stub.url('pymysql'))
+        db.send_query('select * from synthetic_mixed_100000', to_pandas=False)
+
+Tables named 'synthetic_<types>_<rows>' exist implicitly, see `synthetic`.
+"""
+import datetime
+import re
+import socket
+import socketserver
+import struct
+import threading
+
+SERVER_VERSION = '10.3.99-MariaDB-stub'
+
+# Capabilities: long password, found rows, long flag, connect with db, local
+# files, protocol 41, transactions, secure connection, multi statements and
+# results, plugin auth. No SSL and no deprecation of EOF packets.
+CAPABILITIES = 0x1 | 0x2 | 0x4 | 0x8 | 0x80 | 0x200 | 0x2000 | 0x8000 | 0x10000 | 0x20000 | 0x80000
+STATUS_AUTOCOMMIT = 0x2
+UTF8MB4 = 45
+
+# Field types
+LONG, DOUBLE, DATE, VAR_STRING = 3, 5, 10, 253
+
+COM_QUIT, COM_INIT_DB, COM_QUERY, COM_PING = 0x01, 0x02, 0x03, 0x0E
+
+VARIABLES = {
+    'sql_mode': '',
+    'lower_case_table_names': '0',
+    'version': SERVER_VERSION,
+    'tx_isolation': 'REPEATABLE-READ',
+    'transaction_isolation': 'REPEATABLE-READ',
+    'max_allowed_packet': '16777216',
+    'character_set_client': 'utf8mb4',
+    'character_set_connection': 'utf8mb4',
+    'character_set_results': 'utf8mb4',
+    'collation_connection': 'utf8mb4_general_ci',
+    'autocommit': '1',
+}
+
+
+class MysqlStub(object):
+    """
+    A threaded server on localhost, running until `close`.
+
+    - port (int): 0 picks a free port.
+    """
+
+    def __init__(self, port=0):
+        self.tables = {}
+        self.loaded_rows = 0
+        self.queries = []
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return '<MysqlStub port={}>'.format(self.port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, driver='pymysql'):
+        """A sqlalchemy url for the stub."""
+        return 'mysql+{}://root:root@127.0.0.1:{}/test'.format(driver, self.port)
+
+    def add_table(self, name, columns, rows):
+        """
+        Serve rows for queries on table.
+
+        - columns (list[tuple]): (name, field type) for each column.
+        - rows (iterable[tuple]): values, None is NULL.
+        """
+        self.tables[name.lower()] = _ResultSet(columns, rows)
+
+    def table(self, name):
+        """The result set of table; synthetic tables are created on demand."""
+        name = name.lower()
+        if name not in self.tables:
+            match = re.match(r'synthetic_(int|str|mixed)_(\d+)$', name)
+            if match is None:
+                return None
+            columns, rows = synthetic(int(match.group(2)), match.group(1))
+            self.add_table(name, columns, rows)
+        return self.tables[name]
+
+
+def synthetic(rows, types='mixed'):
+    """Deterministic columns and rows: 'int', 'str' or 'mixed' types."""
+    if types == 'int':
+        columns = [('id', LONG), ('a', LONG), ('b', LONG)]
+        data = ((i, i * 7 % 100000, i % 2) for i in range(rows))
+    elif types == 'str':
+        columns = [('id', LONG), ('a', VAR_STRING), ('b', VAR_STRING)]
+        data = ((i, '{:08x}'.format(i * 2654435761 % 2 ** 32), 's{}'.format(i % 100)) for i in range(rows))
+    else:
+        start = datetime.date(2020, 1, 1)
+        columns = [('id', LONG), ('a', VAR_STRING), ('b', DOUBLE), ('c', DATE)]
+        data = (
+            (i, '{:08x}'.format(i * 2654435761 % 2 ** 32), i / 7, start + datetime.timedelta(days=i % 3650))
+            for i in range(rows)
+        )
+    return columns, data
+
+
+class _ResultSet(object):
+    """Column definitions and rows, encoded as text protocol payloads."""
+
+    def __init__(self, columns, rows):
+        self.names = [name for name, _ in columns]
+        self.columns = [_column_definition(name, field_type) for name, field_type in columns]
+        self.rows = [b''.join(_lenenc_value(value) for value in row) for row in rows]
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One client connection."""
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stub = self.server.stub
+        self.reader = self.request.makefile('rb')
+        self.seq = 0
+
+    def handle(self):
+        self.send([_handshake(threading.get_ident() & 0xFFFFFFFF)])
+        self.read()  # the handshake response, we accept every user
+        self.send([_ok()])
+        while True:
+            self.seq = 0
+            try:
+                payload = self.read()
+            except EOFError:
+                return None
+            command, argument = payload[0], payload[1:]
+            if command == COM_QUIT:
+                return None
+            if command == COM_QUERY:
+                self.query(argument.decode('utf-8', 'replace'))
+            elif command in (COM_INIT_DB, COM_PING):
+                self.send([_ok()])
+            else:
+                self.send([_error(1047, 'Unknown command {}'.format(command))])
+
+    def finish(self):
+        self.reader.close()
+
+    def read(self):
+        """Read one packet, returns its payload."""
+        header = self.reader.read(4)
+        if len(header) < 4:
+            raise EOFError()
+        length = header[0] | header[1] << 8 | header[2] << 16
+        self.seq = (header[3] + 1) & 0xFF
+        return self.reader.read(length)
+
+    def send(self, payloads):
+        """Send payloads as packets, in batches."""
+        buffer = []
+        size = 0
+        for payload in payloads:
+            buffer.append(struct.pack('<I', len(payload))[:3] + bytes([self.seq]) + payload)
+            self.seq = (self.seq + 1) & 0xFF
+            size += len(payload) + 4
+            if size > 2 ** 20:
+                self.request.sendall(b''.join(buffer))
+                buffer, size = [], 0
+        self.request.sendall(b''.join(buffer))
+
+    def query(self, sql):
+        self.stub.queries.append(sql)
+        statement = sql.strip().rstrip(';').strip()
+        lower = statement.lower()
+        infile = re.match(r"load\s+data\s+local\s+infile\s+'((?:[^'\\]|\\.)*)'", statement, re.I)
+        if infile:
+            return self.load_data(infile.group(1).replace('\\\\', '\\'))
+        variables = re.match(r"show\s+(?:global\s+|session\s+)?variables\s+like\s+'([^']*)'", lower)
+        if variables:
+            pattern = re.compile(variables.group(1).replace('%', '.*').replace('_', '.') + '$')
+            rows = [(k, v) for k, v in sorted(VARIABLES.items()) if pattern.match(k)]
+            return self.result([('Variable_name', VAR_STRING), ('Value', VAR_STRING)], rows)
+        columns = re.match(r'show\s+(?:full\s+)?columns\s+from\s+`?(\w+)`?', lower)
+        if columns:
+            # Unknown tables have no columns, every column of the data is kept.
+            table = self.stub.table(columns.group(1))
+            names = table.names if table is not None else []
+            return self.result(
+                [(name, VAR_STRING) for name in ('Field', 'Type', 'Null', 'Key', 'Default', 'Extra')],
+                [(name, 'text', 'YES', '', None, '') for name in names],
+            )
+        if lower.startswith('show'):
+            return self.result([('Variable_name', VAR_STRING), ('Value', VAR_STRING)], [])
+        if lower.startswith('select'):
+            return self.select(statement, lower)
+        self.send([_ok()])
+
+    def select(self, statement, lower):
+        table = re.search(r'\bfrom\s+`?(?:\w+`?\.`?)?(\w+)`?', lower)
+        if table:
+            result = self.stub.table(table.group(1))
+            if result is None:
+                return self.result([('result', VAR_STRING)], [])
+            rows = result.rows
+            limit = re.search(r'\blimit\s+(\d+)(?:\s*,\s*(\d+))?\s*$', lower)
+            if limit:
+                offset, count = (0, int(limit.group(1))) if limit.group(2) is None else map(int, limit.groups())
+                rows = rows[offset:offset + count]
+            return self.send_result(result.columns, rows)
+        # Expressions without a table, e.g. 'select @@version' or
+        # "select cast('test' as char(60)) as anon_1".
+        expressions = _split(statement[len('select'):])
+        columns, values = [], []
+        for expression in expressions:
+            alias = re.search(r'\s+as\s+`?(\w+)`?\s*$', expression, re.I)
+            name = alias.group(1) if alias else expression.strip()
+            expression = expression[:alias.start()] if alias else expression
+            columns.append((name, VAR_STRING))
+            values.append(_evaluate(expression.strip()))
+        return self.result(columns, [values])
+
+    def result(self, columns, rows):
+        self.send_result(
+            [_column_definition(name, field_type) for name, field_type in columns],
+            [b''.join(_lenenc_value(value) for value in row) for row in rows],
+        )
+
+    def send_result(self, columns, rows):
+        payloads = [_lenenc_int(len(columns))]
+        payloads.extend(columns)
+        payloads.append(_eof())
+        payloads.extend(rows)
+        payloads.append(_eof())
+        self.send(payloads)
+
+    def load_data(self, path):
+        # Ask for the file, then count the rows of the uploaded content.
+        self.send([b'\xfb' + path.encode('utf-8')])
+        lines = 0
+        while True:
+            payload = self.read()
+            if not payload:
+                break
+            lines += payload.count(b'\n')
+        self.stub.loaded_rows += lines
+        self.send([_ok(affected_rows=lines)])
+
+
+def _evaluate(expression):
+    variable = re.match(r'@@(?:session\.|global\.)?(\w+)$', expression, re.I)
+    if variable:
+        return VARIABLES.get(variable.group(1).lower(), '')
+    literal = re.match(r"cast\s*\(\s*'([^']*)'", expression, re.I) or re.match(r"'([^']*)'$", expression)
+    if literal:
+        return literal.group(1)
+    if expression.lower() == 'database()':
+        return 'test'
+    if expression.lower() in ('version()',):
+        return SERVER_VERSION
+    return expression
+
+
+def _split(expressions):
+    # Split at commas outside of parentheses and quotes.
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in expressions:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    parts.append(current)
+    return [part.strip() for part in parts]
+
+
+def _handshake(connection_id):
+    salt = b'12345678abcdefghijkl'
+    return b''.join([
+        b'\x0a',
+        SERVER_VERSION.encode() + b'\x00',
+        struct.pack('<I', connection_id),
+        salt[:8] + b'\x00',
+        struct.pack('<H', CAPABILITIES & 0xFFFF),
+        bytes([UTF8MB4]),
+        struct.pack('<H', STATUS_AUTOCOMMIT),
+        struct.pack('<H', CAPABILITIES >> 16),
+        bytes([len(salt) + 1]),
+        b'\x00' * 10,
+        salt[8:] + b'\x00',
+        b'mysql_native_password\x00',
+    ])
+
+
+def _ok(affected_rows=0):
+    return b'\x00' + _lenenc_int(affected_rows) + _lenenc_int(0) + struct.pack('<HH', STATUS_AUTOCOMMIT, 0)
+
+
+def _eof():
+    return b'\xfe' + struct.pack('<HH', 0, STATUS_AUTOCOMMIT)
+
+
+def _error(code, message):
+    return b'\xff' + struct.pack('<H', code) + b'#HY000' + message.encode('utf-8')
+
+
+def _column_definition(name, field_type):
+    charset = UTF8MB4 if field_type == VAR_STRING else 63
+    return b''.join([
+        _lenenc_str(b'def'),
+        _lenenc_str(b'test'),
+        _lenenc_str(b''),
+        _lenenc_str(b''),
+        _lenenc_str(name.encode('utf-8')),
+        _lenenc_str(name.encode('utf-8')),
+        b'\x0c',
+        struct.pack('<HIBHB', charset, 255, field_type, 0, 31 if field_type == DOUBLE else 0),
+        b'\x00\x00',
+    ])
+
+
+def _lenenc_int(value):
+    if value < 251:
+        return bytes([value])
+    if value < 2 ** 16:
+        return b'\xfc' + struct.pack('<H', value)
+    if value < 2 ** 24:
+        return b'\xfd' + struct.pack('<I', value)[:3]
+    return b'\xfe' + struct.pack('<Q', value)
+
+
+def _lenenc_str(value):
+    return _lenenc_int(len(value)) + value
+
+
+def _lenenc_value(value):
+    if value is None:
+        return b'\xfb'
+    if isinstance(value, float):
+        value = repr(value)
+    return _lenenc_str(str(value).encode('utf-8'))
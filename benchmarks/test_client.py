@@ -0,0 +1,30 @@
+"""
+The client side of send_query and send_data, against the protocol stub.
+
+The stub serves pre-encoded rows and discards uploaded files, so these
+measure fetching, converting and writing CSV files without a server.
+"""
+import pytest
+
+from .conftest import ROWS, TYPES, make_frame, run
+
+
+@pytest.fixture(scope='module', params=ROWS)
+def rows(request, stub):
+    for types in TYPES:
+        # encode the rows before measuring
+        stub.table('synthetic_{}_{}'.format(types, request.param))
+    return request.param
+
+
+@pytest.mark.parametrize('types', list(TYPES))
+@pytest.mark.parametrize('to', ['pandas', 'datatable', 'arrow'])
+def test_send_query(benchmark, stub_db, rows, types, to):
+    query = 'select * from synthetic_{}_{};'.format(types, rows)
+    run(benchmark, lambda: stub_db.send_query(query, to=to), rows)
+
+
+@pytest.mark.parametrize('types', list(TYPES))
+def test_send_data(benchmark, stub_db, stub, rows, types):
+    df = make_frame(rows, types)
+    run(benchmark, lambda: stub_db.send_data(df, 'bench_{}'.format(types), 'insert'), rows)
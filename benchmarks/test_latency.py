@@ -0,0 +1,105 @@
+"""
+Guard the fixed cost per call of the public methods against regressions.
+
+Each method is timed on a tiny in-memory SQLite table against the same work
+done directly with sqlalchemy and pandas; the difference is the overhead of
+dbrequests: rendering the query, the connection and the instrumentation. The
+import time is compared with an upper bound.
+
+The thresholds are wall-clock times, so they are not part of the unit tests;
+CI runs this file in a separate step, see .github/workflows.
+"""
+import timeit
+
+import pytest
+from dbrequests.tests.test_import import run_import
+
+pd = pytest.importorskip('pandas')
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+# Generous upper bounds of the overhead in seconds, measured as the best of
+# several repetitions to be robust against a busy machine.
+MAX_OVERHEAD = {
+    'send_query': 0.001,
+    'send_bulk_query': 0.0005,
+    'send_data': 0.002,
+    'fetch_records': 0.0002,
+    'fetch_one': 0.0002,
+    'fetch_scalar': 0.0002,
+}
+# Importing dbrequests and creating a Database, in seconds; importing pandas
+# alone takes longer.
+MAX_IMPORT_TIME = 0.2
+
+
+@pytest.fixture(scope='module')
+def db():
+    from dbrequests import Database
+
+    db = Database('sqlite://')
+    db.send_bulk_query('create table cats (id integer primary key, name text)')
+    db.send_bulk_query("insert into cats values (1, 'Sandy'), (2, 'Cookie')")
+    yield db
+    db.close()
+
+
+def best(function, number):
+    """The best time of one call in seconds."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def overhead(method, direct, number=100):
+    """Time spent in dbrequests compared with the direct way."""
+    method()  # warm up caches and the pool
+    direct()
+    return best(method, number) - best(direct, number)
+
+
+def test_send_query(db):
+    query = 'select * from cats'
+
+    def direct():
+        with db._engine.connect() as conn:
+            pd.read_sql(sqlalchemy.text(query), conn)
+
+    assert overhead(lambda: db.send_query(query), direct) < MAX_OVERHEAD['send_query']
+
+
+def test_send_bulk_query(db):
+    query = 'update cats set name = name'
+
+    def direct():
+        with db._engine.connect() as conn:
+            conn.execute(sqlalchemy.text(query))
+
+    assert overhead(lambda: db.send_bulk_query(query), direct) < MAX_OVERHEAD['send_bulk_query']
+
+
+def test_send_data(db):
+    df = pd.DataFrame({'id': [1], 'name': ['Sandy']})
+
+    def direct():
+        with db._engine.begin() as conn:
+            df.to_sql('direct', conn, if_exists='append', index=False)
+
+    elapsed = overhead(lambda: db.send_data(df, 'dbrequests'), direct, number=20)
+    assert elapsed < MAX_OVERHEAD['send_data']
+
+
+@pytest.mark.parametrize('method', ['fetch_records', 'fetch_one', 'fetch_scalar'])
+def test_fetch(db, method):
+    query = 'select count(*) from cats'
+
+    def direct():
+        with db._engine.connect() as conn:
+            conn.execute(sqlalchemy.text(query)).fetchall()
+
+    elapsed = overhead(lambda: getattr(db, method)(query), direct)
+    assert elapsed < MAX_OVERHEAD[method]
+
+
+@pytest.mark.parametrize('module', ['dbrequests', 'dbrequests.mysql'])
+def test_import_time(module):
+    # best of three, to be robust against a busy machine
+    elapsed = min(run_import(module)['elapsed'] for _ in range(3))
+    assert elapsed < MAX_IMPORT_TIME
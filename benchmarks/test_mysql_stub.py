@@ -0,0 +1,113 @@
+"""The protocol stub answers like a server."""
+import pytest
+
+from .mysql_stub import SERVER_VERSION
+
+pymysql = pytest.importorskip('pymysql')
+
+
+@pytest.fixture
+def connection(stub):
+    connection = pymysql.connect(
+        host='127.0.0.1', port=stub.port, user='any', password='any', database='test', local_infile=True)
+    yield connection
+    connection.close()
+
+
+def test_variables(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("select @@version, database(), cast('x' as char(60)) as anon_1")
+        assert cursor.fetchall() == ((SERVER_VERSION, 'test', 'x'),)
+        cursor.execute("show variables like 'sql_mode'")
+        assert cursor.fetchall() == (('sql_mode', ''),)
+
+
+def test_synthetic(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('select * from synthetic_int_10 limit 2, 3')
+        assert cursor.fetchall() == ((2, 14, 0), (3, 21, 1), (4, 28, 0))
+
+
+def test_add_table(connection, stub):
+    stub.add_table('people', [('id', 3), ('name', 253)], [(1, 'Ann'), (2, None)])
+    with connection.cursor() as cursor:
+        cursor.execute('select * from `people`')
+        assert cursor.fetchall() == ((1, 'Ann'), (2, None))
+        cursor.execute('show columns from people')
+        assert [row[0] for row in cursor.fetchall()] == ['id', 'name']
+
+
+def test_load_data(connection, stub, tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('1,2\n3,4\n5,6\n')
+    before = stub.loaded_rows
+    with connection.cursor() as cursor:
+        assert cursor.execute("load data local infile '{}' into table t".format(path)) == 3
+    assert stub.loaded_rows - before == 3
+
+
+def test_send_data(stub):
+    from datatable import Frame
+    from dbrequests.mysql import Database
+
+    with Database(stub.url('pymysql')) as db:
+        before = stub.loaded_rows
+        db.send_data(Frame(id=[1, 2], a=['x', 'y']), 'anything', 'update')
+        assert stub.loaded_rows - before == 2
+        assert db.send_query('select * from synthetic_str_2', to_pandas=False).shape == (2, 3)
+
+
+def test_session_status(stub):
+    """The cost of reading the status is measured once per pooled connection."""
+    from dbrequests.mysql import Database
+
+    with Database(stub.url('pymysql'), session_status=True) as db:
+        before = len(stub.queries)
+        for _ in range(3):
+            db.send_query('select * from synthetic_int_2', to_pandas=False)
+        status = [query for query in stub.queries[before:] if query.lower().startswith('show session status')]
+        assert len(status) == 2 * 3 + 2
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_truncate_chunks(stub, chunked):
+    """Chunks are loaded after a delete, truncate table would commit."""
+    from datatable import Frame
+    from dbrequests.mysql import Database
+
+    frames = [Frame(id=[1, 2]), Frame(id=[3])]
+    with Database(stub.url('pymysql')) as db:
+        before = len(stub.queries)
+        db.send_data(frames if chunked else frames[0], 'anything', 'truncate')
+        queries = [query.lower() for query in stub.queries[before:]]
+        assert ('delete from anything;' in queries) == chunked
+        assert any(query.startswith('truncate table') for query in queries) != chunked
+
+
+def test_truncate_file(stub, tmp_path):
+    from dbrequests.mysql import Database
+
+    path = tmp_path / 'data.csv'
+    path.write_text('id\n1\n2\n')
+    with Database(stub.url('pymysql')) as db:
+        before = len(stub.queries)
+        db.send_file(str(path), 'anything', 'truncate')
+        queries = [query.lower() for query in stub.queries[before:]]
+        assert 'delete from anything;' in queries
+        assert not any(query.startswith('truncate table') for query in queries)
+
+
+@pytest.mark.parametrize('to', ['datatable', 'arrow', 'pandas_arrow'])
+def test_cache(stub, tmp_path, to):
+    """The second query is answered from the cache, in the same format."""
+    from dbrequests.mysql import Database
+
+    with Database(stub.url('pymysql'), cache=str(tmp_path)) as db:
+        res = db.send_query('select * from synthetic_mixed_3', to=to)
+        before = len(stub.queries)
+        cached = db.send_query('select * from synthetic_mixed_3', to=to)
+        assert len(stub.queries) == before
+        assert type(cached) is type(res)
+        assert cached.shape == res.shape
+        if to == 'arrow':
+            assert cached.schema == res.schema
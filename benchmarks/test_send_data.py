@@ -0,0 +1,47 @@
+"""Writing data with send_data in every mode."""
+import pytest
+from datatable import f
+
+from .conftest import ROWS, TYPES, create_table, make_frame, run
+
+MODES = ['insert', 'truncate', 'delete', 'replace', 'update',
+         'insert_diffs', 'update_diffs', 'replace_diffs', 'sync_diffs']
+
+
+@pytest.fixture(scope='module', params=ROWS)
+def rows(request):
+    return request.param
+
+
+@pytest.mark.parametrize('types', list(TYPES))
+@pytest.mark.parametrize('mode', MODES)
+def test_send_data(benchmark, db, rows, types, mode):
+    table = 'bench_send_{}'.format(types)
+    old = make_frame(rows, types)
+    new = make_frame(rows, types, seed=1)
+    # a quarter of the rows changed
+    new[f.id >= rows // 4, :] = old[f.id >= rows // 4, :]
+
+    def setup():
+        create_table(db, table, types)
+        if mode != 'insert':
+            db.send_data(old, table)
+        if mode == 'sync_diffs':
+            db.send_bulk_query('alter table `{}` add `delete` int(1) invisible default null;'.format(table))
+
+    run(benchmark, lambda: db.send_data(new, table, mode), rows, setup=setup)
+
+
+@pytest.mark.parametrize('types', ['int'])
+def test_send_data_pandas(benchmark, db, rows, types):
+    """The base Database sends a DataFrame with pandas.to_sql."""
+    from dbrequests import Database
+
+    table = 'bench_send_{}'.format(types)
+    df = make_frame(rows, types).to_pandas()
+    with Database(db.db_url) as base_db:
+        run(benchmark, lambda: base_db.send_data(df, table), rows, setup=lambda: create_table(db, table, types))
+
+
+def test_make_frame_is_deterministic():
+    assert make_frame(10, 'mixed').to_list() == make_frame(10, 'mixed').to_list()
@@ -0,0 +1,30 @@
+"""Deleting rows with send_delete in every mode."""
+import pytest
+from datatable import f
+
+from .conftest import ROWS, create_table, make_frame, run
+
+MODES = ['in_join', 'not_in_join', 'in_set', 'not_in_set', 'in_delete_col']
+
+
+@pytest.fixture(scope='module', params=ROWS)
+def rows(request):
+    return request.param
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_send_delete(benchmark, db, rows, mode):
+    table = 'bench_delete'
+    data = make_frame(rows, 'int')
+    # delete every other row
+    keys = data[f.id % 2 == 0, ['id']]
+    if mode.startswith('not_in'):
+        keys = data[f.id % 2 == 1, ['id']]
+
+    def setup():
+        create_table(db, table, 'int')
+        db.send_data(data, table)
+        if mode == 'in_delete_col':
+            db.send_bulk_query('alter table `{}` add `delete` int(1) invisible default null;'.format(table))
+
+    run(benchmark, lambda: db.send_delete(keys, table, mode), rows // 2, setup=setup)
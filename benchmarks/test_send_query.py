@@ -0,0 +1,34 @@
+"""Reading results with send_query."""
+import pytest
+
+from .conftest import ROWS, TYPES, create_table, make_frame, run
+
+
+@pytest.fixture(scope='module', params=ROWS)
+def table(request, db):
+    """Tables of each type with the parametrized number of rows."""
+    for types in TYPES:
+        create_table(db, 'bench_{}'.format(types), types)
+        db.send_data(make_frame(request.param, types), 'bench_{}'.format(types))
+    return request.param
+
+
+@pytest.mark.parametrize('types', list(TYPES))
+@pytest.mark.parametrize('to', ['pandas', 'datatable', 'arrow'])
+def test_send_query(benchmark, db, table, types, to):
+    query = 'select * from bench_{};'.format(types)
+    run(benchmark, lambda: db.send_query(query, to=to), table)
+
+
+@pytest.mark.parametrize('types', ['mixed'])
+def test_send_query_bulk_convert(benchmark, db, table, types):
+    with type(db)(db.db_url, bulk_convert=True) as fast_db:
+        query = 'select * from bench_{};'.format(types)
+        run(benchmark, lambda: fast_db.send_query(query, to_pandas=False), table)
+
+
+@pytest.mark.parametrize('types', ['str'])
+def test_send_query_to_file(benchmark, db, table, types, tmp_path):
+    query = 'select * from bench_{};'.format(types)
+    path = str(tmp_path / 'result.csv')
+    run(benchmark, lambda: db.send_query_to_file(query, path), table)
@@ -1,3 +1,8 @@
+from .aio import AsyncDatabase
+from .cache import QueryCache
 from .connection import Connection
 from .database import Database
+from .incremental import FileState, TableState
+from .instrumentation import Event, MemoryBudgetExceeded, MetricsCollector
 from .query import Query
+from .transfer import transfer
@@ -0,0 +1,153 @@
+"""Asyncio interface: the methods of a Database as coroutines."""
+
+import functools
+import threading
+
+from .database import Database
+
+# Number of workers if the pool of the engine has no upper bound.
+DEFAULT_MAX_WORKERS = 16
+
+
+class _Cancelled(Exception):
+    """The call was cancelled before it opened a connection."""
+
+
+class AsyncDatabase(object):
+    """
+    Provides the methods of `dbrequests.Database` as coroutines.
+
+    Every call is executed by a managed thread pool on its own connection,
+    so that the event loop is never blocked. When the awaiting task is
+    cancelled, e.g. by `asyncio.wait_for`, the statement is cancelled on the
+    server, if the driver supports it. A call cancelled before it opened its
+    connection sends no statement at all.
+
+    - max_workers: (int|None) number of calls executed concurrently. Every
+      call holds a connection of the pool of the engine, a worker waiting
+      for a connection blocks until the pool times out. Defaults to the
+      size of the pool, 'pool_size' plus 'max_overflow' of
+      sqlalchemy.create_engine, minus one connection left for cancelling
+      statements; or 16 if the pool has no upper bound. When setting it,
+      make sure the pool allows for as many connections.
+    - args, kwargs: all other arguments are passed to `Database`.
+
+    The underlying Database is available as attribute 'database'.
+    """
+
+    _database_class = Database
+
+    def __init__(self, *args, max_workers=None, **kwargs):
+        self.database = self._database_class(*args, **kwargs)
+        self.max_workers = max_workers
+        # The thread pool is created on first use, like the engine, which
+        # knows the size of its pool.
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def close(self):
+        """Shut down the thread pool and close the database."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.database.close()
+
+    def _get_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._executor_lock:
+            if self._executor is None:
+                max_workers = self.max_workers or _pool_workers(self.database._engine.pool)
+                self._executor = ThreadPoolExecutor(
+                    max_workers, thread_name_prefix='dbrequests')
+            return self._executor
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc, val, traceback):
+        self.close()
+
+    def __repr__(self):
+        return '<AsyncDatabase open={}>'.format(self.database._open)
+
+    async def send_query(self, query, escape_percentage=None, remove_comments=None, **params):
+        """See Database.send_query."""
+        return await self._run(
+            'send_query', query, escape_percentage, remove_comments, **params)
+
+    async def send_bulk_query(self, query, escape_percentage=None, remove_comments=None, **params):
+        """See Database.send_bulk_query."""
+        return await self._run(
+            'send_bulk_query', query, escape_percentage, remove_comments, **params)
+
+    async def send_data(self, df, table, mode='insert', **params):
+        """See Database.send_data."""
+        return await self._run('send_data', df, table, mode, **params)
+
+    async def _run(self, method, *args, **kwargs):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        call = _Call(getattr(self.database, method), args, kwargs)
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(self._execute, call))
+        except asyncio.CancelledError:
+            # The thread keeps running until the server gives up on the
+            # statement, so we kill it from yet another thread.
+            await loop.run_in_executor(None, self._cancel, call)
+            raise
+
+    def _execute(self, call):
+        with self.database._track_connections(call.register):
+            try:
+                return call.method(*call.args, **call.kwargs)
+            except _Cancelled:
+                return None
+
+    def _cancel(self, call):
+        # Connections opened after this point are refused by call.register.
+        for conn in call.cancel():
+            # While we hold the lock the connection can't be closed, i.e.
+            # returned to the pool and picked up by another call.
+            with conn._close_lock:
+                if conn.open:
+                    self.database._cancel(conn)
+
+
+class _Call(object):
+    """The state of a single call executed in the thread pool."""
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.connections = []
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def register(self, conn):
+        """
+        Track conn, opened by the call in the worker. Once the call is
+        cancelled no statement is sent, conn is refused with _Cancelled.
+        """
+        with self._lock:
+            if self.cancelled:
+                raise _Cancelled()
+            self.connections.append(conn)
+
+    def cancel(self):
+        """Mark the call as cancelled and return its connections."""
+        with self._lock:
+            self.cancelled = True
+            return list(self.connections)
+
+
+def _pool_workers(pool):
+    """The number of workers for pool, one connection is left for cancelling."""
+    # Only a QueuePool has an upper bound, a negative max_overflow means none.
+    size = getattr(pool, 'size', None)
+    max_overflow = getattr(pool, '_max_overflow', -1)
+    if not callable(size) or max_overflow < 0:
+        return DEFAULT_MAX_WORKERS
+    return max(size() + max_overflow - 1, 1)
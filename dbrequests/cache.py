@@ -0,0 +1,151 @@
+"""A persistent, on-disk cache for query results."""
+
+import functools
+import hashlib
+import json
+import os
+import time
+import uuid
+
+
+class QueryCache(object):
+    """
+    Stores results of queries on disk in a columnar format.
+
+    datatable Frames are stored as Jay files, which are memory mapped when
+    read. pandas DataFrames are stored as Parquet files, this requires
+    pyarrow or fastparquet. pyarrow Tables and polars DataFrames are stored
+    as Parquet files, too, and read back into the same type. Other values,
+    e.g. lists of records or iterators of chunks, are not stored.
+
+    - path (str): the directory of the cache. Is created if it does not
+      exist. Several processes may share one directory.
+    - ttl (int|float|None): seconds until a result expires. None means
+      results never expire. Defaults to 1 hour.
+    - max_size (int|None): maximum size of the cache in bytes. When it is
+      exceeded, the least recently used results are removed. None means no
+      limit. Defaults to 1GB.
+    """
+
+    # The extension records the type of the result, see _read.
+    _extensions = ('.jay', '.parquet', '.arrow.parquet', '.polars.parquet')
+
+    def __init__(self, path, ttl=3600, max_size=2 ** 30):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return '<QueryCache path={} ttl={}>'.format(self.path, self.ttl)
+
+    @staticmethod
+    def key(*parts):
+        """Hash arbitrary parts, e.g. connection identity, sql and parameters."""
+        text = json.dumps(parts, sort_keys=True, default=repr)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the result stored for key or None."""
+        for file in self._files(key):
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                continue
+            now = time.time()
+            if self.ttl is not None and stat.st_mtime + self.ttl < now:
+                self._remove(file)
+                continue
+            # The modification time is the time of creation and is used for
+            # the ttl; the access time is used for the eviction.
+            os.utime(file, (now, stat.st_mtime))
+            return self._read(file)
+        return None
+
+    def put(self, key, value):
+        """Store value, a Frame, DataFrame or pyarrow Table, for key."""
+        if _is_frame(value):
+            extension, write = '.jay', value.to_jay
+        elif _is_arrow_table(value):
+            import pyarrow.parquet as pq
+            extension, write = '.arrow.parquet', functools.partial(pq.write_table, value)
+        elif type(value).__module__.startswith('polars'):
+            extension, write = '.polars.parquet', value.write_parquet
+        elif hasattr(value, 'to_parquet'):
+            extension, write = '.parquet', value.to_parquet
+        else:
+            return None
+        file = os.path.join(self.path, key + extension)
+        tmp_file = self._tmp_file(file)
+        try:
+            write(tmp_file)
+        except BaseException:
+            self._remove(tmp_file)
+            raise
+        # Readers never see partially written files.
+        os.replace(tmp_file, file)
+        self._evict()
+
+    def clear(self):
+        """Remove all results."""
+        for file, _ in self._entries():
+            self._remove(file)
+
+    def _files(self, key):
+        return [os.path.join(self.path, key + ext) for ext in self._extensions]
+
+    def _tmp_file(self, file):
+        return '{}.{}.tmp'.format(file, uuid.uuid4().hex)
+
+    @staticmethod
+    def _read(file):
+        if file.endswith('.jay'):
+            from datatable import fread
+            return fread(file)
+        if file.endswith('.arrow.parquet'):
+            import pyarrow.parquet as pq
+            return pq.read_table(file)
+        if file.endswith('.polars.parquet'):
+            import polars
+            return polars.read_parquet(file)
+        from pandas import read_parquet
+        return read_parquet(file)
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(self._extensions):
+                    try:
+                        entries.append((entry.path, entry.stat()))
+                    except FileNotFoundError:
+                        pass
+        return entries
+
+    def _evict(self):
+        if self.max_size is None:
+            return None
+        entries = self._entries()
+        size = sum(stat.st_size for _, stat in entries)
+        for file, stat in sorted(entries, key=lambda entry: entry[1].st_atime):
+            if size <= self.max_size:
+                break
+            self._remove(file)
+            size -= stat.st_size
+
+    @staticmethod
+    def _remove(file):
+        try:
+            os.remove(file)
+        except OSError:
+            # Already removed by another process, or, on Windows, the file
+            # is still memory mapped.
+            pass
+
+
+def _is_frame(value):
+    return type(value).__module__.startswith('datatable')
+
+
+def _is_arrow_table(value):
+    return type(value).__module__.startswith('pyarrow') and type(value).__name__ == 'Table'
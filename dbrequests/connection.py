@@ -1,21 +1,31 @@
 import inspect
+import threading
 import warnings
+from collections.abc import Iterator
 from contextlib import contextmanager
+from functools import lru_cache
 
-from sqlalchemy import text
-from pandas import read_sql
+from .instrumentation import Instrumentation
 
 
 class Connection(object):
     """A Database connection."""
 
+    # Replaced by the instrumentation of the Database opening the connection.
+    instrumentation = Instrumentation()
+
     def __init__(self, connection):
         self._conn = connection
         self.open = not connection.closed
+        # Held while closing, so that another thread cancelling the
+        # statement never sees the connection after it went back to the
+        # pool, see AsyncDatabase.
+        self._close_lock = threading.Lock()
 
     def close(self):
-        self._conn.close()
-        self.open = False
+        with self._close_lock:
+            self._conn.close()
+            self.open = False
 
     def __enter__(self):
         return self
@@ -30,20 +40,68 @@ class Connection(object):
         """Executes the given SQL query against the connected Database.
         Parameters can, optionally, be provided. Uses pandas.read_sql and returns a Pandas Dataframe
         """
+        # Importing pandas is expensive, so we defer it until first use.
+        from pandas import read_sql
 
         # Execute the given query.
-        params = {k: v for k, v in params.items(
-        ) if k in inspect.getfullargspec(read_sql).args}
-        results = read_sql(query, self._conn, **params)
+        params = {k: v for k, v in params.items() if k in argnames(read_sql)}
+        with self.instrumentation.measure('execute', str(query)) as event:
+            results = read_sql(query, self._conn, **params)
+            # With chunksize pandas returns an iterator of DataFrames.
+            if hasattr(results, 'shape'):
+                event.rows = len(results)
         return results
 
+    def query_chunks(self, query, consume, chunksize=None, **params):
+        """
+        Executes query and calls consume with a DataFrame for every chunk of
+        chunksize rows, 100000 by default. Returns the number of rows.
+        """
+        from pandas import read_sql
+
+        params = {k: v for k, v in params.items() if k in argnames(read_sql)}
+        params['chunksize'] = chunksize or 100000
+        rows = 0
+        with self.instrumentation.measure('execute', str(query)) as event:
+            for chunk in read_sql(query, self._conn, **params):
+                rows += len(chunk)
+                consume(chunk)
+            event.rows = rows
+        return rows
+
     def bulk_query(self, query, **params):
         """Bulk insert or update."""
-        params = {k: v for k, v in params.items(
-        ) if k in inspect.getfullargspec(self._conn.execute).args}
-        res = self._conn.execute(text(query), **params)
+        params = {k: v for k, v in params.items()
+                  if k in argnames(type(self._conn).execute)}
+        with self.instrumentation.measure('execute', query) as event:
+            res = self._conn.execute(_text(query), **params)
+            event.rows = res.rowcount
         return res.rowcount
 
+    def records(self, query, params=None, limit=None, as_dict=False):
+        """
+        Executes query and returns the rows as tuples, or dicts, without
+        pandas.
+
+        - params (dict|None): bind parameters, e.g. {'id': 1} for ':id'.
+        - limit (int|None): fetch at most limit rows.
+        - as_dict (bool): return dicts instead of tuples.
+        """
+        with self.instrumentation.measure('execute', query) as event:
+            result = self._conn.execute(_text(query), params or {})
+            try:
+                if limit is None:
+                    rows = result.fetchall()
+                else:
+                    rows = result.fetchmany(limit)
+                keys = list(result.keys())
+            finally:
+                result.close()
+            event.rows = len(rows)
+        if as_dict:
+            return [dict(zip(keys, row)) for row in rows]
+        return [tuple(row) for row in rows]
+
     def send_data(self, df, table, mode='insert', **params):
         """
         Sends data to table in database. If the table already exists, different
@@ -58,14 +116,34 @@ class Connection(object):
                 - 'replace': replaces duplicate primary keys
                 - 'update': updates duplicate primary keys
                 - Derived classes may implement additional modes.
+
+        df may also be an iterator, e.g. a generator, of data frames. They
+        are sent one after the other, only the first chunk truncates the
+        table. 'truncate' recreates the table with pandas, which commits on
+        databases without transactional DDL, e.g. MySQL; dbrequests.mysql
+        deletes the rows instead and loads all chunks in one transaction.
         """
         mode_implementation = '_send_data_{}'.format(mode)
-        if hasattr(self, mode_implementation):
-            getattr(self, mode_implementation)(df, table, **params)
-        else:
+        if not hasattr(self, mode_implementation):
             raise ValueError('{} is not a known mode'.format(mode))
+        chunks = as_chunks(df)
+        if chunks is not None:
+            self._send_chunks(chunks, table, mode, **params)
+        else:
+            getattr(self, mode_implementation)(df, table, **params)
         return 'Data successfully sent.'
 
+    def _send_chunks(self, chunks, table, mode, **params):
+        """Send an iterator of data frames chunk by chunk."""
+        if mode == 'sync_diffs':
+            # Rows missing in a chunk would be deleted.
+            raise ValueError("mode 'sync_diffs' can't be used with an iterator of chunks")
+        send = getattr(self, '_send_data_{}'.format(mode))
+        for chunk in chunks:
+            send(chunk, table, **params)
+            if mode in ('truncate', 'delete'):
+                send = self._send_data_insert
+
     def _send_data_insert(self, df, table, **params):
         self._send_data_pandas(df, table, 'append', **params)
 
@@ -103,8 +181,10 @@ class Connection(object):
     def _send_data_pandas(self, df, table, pandas_mode='append', **params):
         """Uses the pandas-method to_sql to send data."""
 
-        df.to_sql(table, self._conn, if_exists=pandas_mode,
-                  index=False, **params)
+        with self.instrumentation.measure('to_sql', table) as event:
+            df.to_sql(table, self._conn, if_exists=pandas_mode,
+                      index=False, **params)
+            event.rows = len(df)
 
     @contextmanager
     def _temporary_table(self, table: str, with_cols: (str, None) = None, with_temp: bool = True):
@@ -164,3 +244,44 @@ class Connection(object):
         on the returned object as appropriate."""
 
         return self._conn.begin()
+
+
+def as_chunks(df):
+    """
+    An iterator over the chunks in df, if it is an iterator or a list or
+    tuple of data frames; None otherwise.
+    """
+    if isinstance(df, Iterator):
+        return df
+    if isinstance(df, (list, tuple)) and df and all(_is_frame(chunk) for chunk in df):
+        return iter(df)
+    return None
+
+
+def _is_frame(obj):
+    # pandas DataFrames, datatable Frames and pyarrow Tables, without
+    # importing any of them. Lists of other objects are columns, e.g. for
+    # Frame([[1, 2], ['a', 'b']]).
+    return type(obj).__name__ in ('DataFrame', 'Frame', 'Table')
+
+
+@lru_cache(maxsize=None)
+def argnames(function):
+    """The names of the arguments of function; cached, inspect is slow."""
+    return frozenset(inspect.getfullargspec(function).args)
+
+
+def _text(query):
+    # text() parses the bind parameters of query, so we reuse short
+    # statements. Long ones, e.g. generated bulk statements, rarely repeat
+    # and the cache would only keep them alive.
+    if len(query) < 1000:
+        return _cached_text(query)
+    from sqlalchemy import text
+    return text(query)
+
+
+@lru_cache(maxsize=1024)
+def _cached_text(query):
+    from sqlalchemy import text
+    return text(query)
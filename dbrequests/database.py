@@ -1,12 +1,15 @@
 import os
+import threading
 import warnings
 from contextlib import contextmanager
 
-from pandas import DataFrame
-from sqlalchemy import create_engine, exc, inspect
-
+from .cache import QueryCache
 from .connection import Connection
+from .incremental import (FileState, MemoryState, incremental_query, is_table, merge, shift,
+                          state_name, watermark)
+from .instrumentation import Instrumentation
 from .query import Query
+from .single_flight import SingleFlight
 
 
 class Database(object):
@@ -32,19 +35,53 @@ class Database(object):
     - escape_percentage: (bool) escape percentages when reading queries from a
       file.
     - remove_comments: (bool) remove comments when reading queries from a file.
+    - cache: (QueryCache|str|None) cache the results of send_query on disk.
+      A str is the directory of a QueryCache with default settings. Results
+      are identified by the query text, after reading and formatting sql
+      files, the parameters and the database url. Defaults to None, no
+      caching.
+    - single_flight: (bool) concurrent calls of send_query with identical
+      queries and parameters share one execution. The statistics are in
+      `single_flight.stats`. Defaults to False.
+    - hooks: (list[callable]|None) instrumentation hooks. Each hook is called
+      with an `Event` for every measured phase of a call, e.g. rendering,
+      executing and fetching a query. See `MetricsCollector` for a hook
+      aggregating the events. More hooks can be added with
+      `instrumentation.add_hook`.
+    - track_memory: (bool) measure the peak of allocated memory and the
+      resident set size in every phase, see `Event.memory` and `Event.rss`.
+      Uses tracemalloc, which slows down allocations. Defaults to False.
+    - memory_budget: (int|None) maximum resident set size of the process in
+      bytes. Reading a result checks the budget after every fetched chunk
+      and raises `MemoryBudgetExceeded` when it is exceeded. Defaults to
+      None, no budget.
     - kwargs:
         - creds: (dict) deprecated, provide a dict as db_url
         - ...: all arguments are passed to sqlalchemy.create_engine
+
+    The sqlalchemy engine is created on first use, so that instantiating a
+    Database is cheap. Neither pandas nor sqlalchemy are imported before they
+    are needed.
     """
 
     _connection_class = Connection
 
     def __init__(self, db_url=None, sql_dir=None,
-                 escape_percentage=False, remove_comments=False, **kwargs):
+                 escape_percentage=False, remove_comments=False, cache=None,
+                 single_flight=False, hooks=None, track_memory=False,
+                 memory_budget=None, **kwargs):
 
         self.sql_dir = sql_dir or os.getcwd()
         self._escape_percentage = escape_percentage
         self._remove_comments = remove_comments
+        if isinstance(cache, str):
+            cache = QueryCache(cache)
+        self._cache = cache
+        self.single_flight = SingleFlight() if single_flight else None
+        self.instrumentation = Instrumentation(
+            hooks, track_memory=track_memory, memory_budget=memory_budget)
+        self._local = threading.local()
+        self._watermarks = MemoryState()
         kwargs = self._init_db_url(db_url, **kwargs)
         self._init_engine(**kwargs)
         self._open = True
@@ -82,14 +119,65 @@ class Database(object):
 
     def _init_engine(self, **kwargs):
         # We have this method, so that subclasses may override the init
-        # process.
-        self._engine = create_engine(self.db_url, **kwargs)
+        # process. The engine is not created here, but on first access of
+        # self._engine.
+        self._engine_kwargs = kwargs
+        self._engine_lock = threading.Lock()
+        self._lazy_engine = None
+
+    def _create_engine(self, **kwargs):
+        # Called once, on first use of the engine. Subclasses may override
+        # this method to defer expensive setup, e.g. importing the driver.
+        from sqlalchemy import create_engine
+        return create_engine(self.db_url, **kwargs)
+
+    @property
+    def _engine(self):
+        if self._lazy_engine is None:
+            with self._engine_lock:
+                if self._lazy_engine is None:
+                    self._lazy_engine = self._create_engine(**self._engine_kwargs)
+        return self._lazy_engine
 
     def close(self):
         """Close the connection."""
-        self._engine.dispose()
+        if self._lazy_engine is not None:
+            self._lazy_engine.dispose()
         self._open = False
 
+    def __getstate__(self):
+        # The engine, locks and thread locals can not be pickled. A copy of
+        # a Database, e.g. in another process, creates its own engine on first
+        # use.
+        state = self.__dict__.copy()
+        state['_lazy_engine'] = None
+        # Hooks do not survive pickling: see Instrumentation.
+        del state['_engine_lock']
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._engine_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _reset_engine(self):
+        """
+        Forget the engine without closing its connections. Used in forked
+        child processes: the connections in the pool are shared with the
+        parent and must not be used or closed by the child.
+        """
+        engine = self._lazy_engine
+        self._lazy_engine = None
+        self._engine_lock = threading.Lock()
+        self._local = threading.local()
+        if engine is not None:
+            try:
+                engine.dispose(close=False)
+            except TypeError:
+                # sqlalchemy < 1.4.33 can not dispose without closing.
+                pass
+
     def __enter__(self):
         return self
 
@@ -101,20 +189,57 @@ class Database(object):
 
     def get_table_names(self):
         """Returns a list of table names for the connected database."""
+        from sqlalchemy import inspect
+
         return inspect(self._engine).get_table_names()
 
     def get_connection(self):
         """Get a connection from the sqlalchemy engine."""
         if not self._open:
+            from sqlalchemy import exc
             raise exc.ResourceClosedError('Database closed.')
-        return self._connection_class(self._engine.connect())
+        conn = self._connection_class(self._engine.connect())
+        conn.instrumentation = self.instrumentation
+        register = getattr(self._local, 'register', None)
+        if register is not None:
+            try:
+                register(conn)
+            except BaseException:
+                conn.close()
+                raise
+        return conn
 
-    def __get_query_text(self, query, escape_percentage, remove_comments, **params):
-        """Private wrapper for accessing the text of the query."""
+    @contextmanager
+    def _track_connections(self, register):
+        """
+        Call register with every connection opened by the current thread.
+        register may raise to refuse the connection, it is closed then.
+        """
+        self._local.register = register
+        try:
+            yield
+        finally:
+            self._local.register = None
+
+    def _cancel(self, conn):
+        """
+        Cancel the statement running on conn. This is called from another
+        thread than the one using conn. Not every driver supports this, in
+        which case the statement runs to completion.
+        """
+        dbapi_conn = conn._conn.connection
+        cancel = getattr(dbapi_conn, 'cancel', None) or getattr(dbapi_conn, 'interrupt', None)
+        if cancel is not None:
+            cancel()
+
+    def _get_query_text(self, query, escape_percentage, remove_comments, **params):
+        """Wrapper for accessing the text of the query, also used by subclasses."""
         escape_percentage = escape_percentage or self._escape_percentage
         remove_comments = remove_comments or self._remove_comments
-        sql = Query(query, sql_dir=self.sql_dir, escape_percentage=escape_percentage,
-                    remove_comments=remove_comments, **params)
+        with self.instrumentation.measure('render') as event:
+            sql = Query(query, sql_dir=self.sql_dir, escape_percentage=escape_percentage,
+                        remove_comments=remove_comments, **params)
+            event.query = sql.text
         return sql.text
 
     def send_query(self, query, escape_percentage=None, remove_comments=None, **params):
@@ -128,9 +253,196 @@ class Database(object):
             - the name of a file as string (with or without .sql)
             - a sqlalchemy selectable
         """
-        text = self.__get_query_text(
-            query, escape_percentage, remove_comments, **params)
-        return self.query(text, **params)
+        with self.instrumentation.measure('send_query') as event:
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **params)
+            event.query = text
+            res = self._run_query(text, **params)
+            # With chunksize pandas returns an iterator of DataFrames.
+            if hasattr(res, 'shape'):
+                event.rows = res.shape[0]
+            return res
+
+    def send_query_chunks(self, query, consume, chunksize=None, escape_percentage=None,
+                          remove_comments=None, **params):
+        """Executes a query like send_query, but calls consume with every
+        chunk of the result instead of returning it. The chunks are pandas
+        DataFrames, Frames in dbrequests.mysql. Returns the number of rows.
+
+        Args:
+        - query (str): see send_query.
+        - consume (callable): called with each chunk.
+        - chunksize (int|None): rows per chunk, defaults to 100000, in
+          dbrequests.mysql to the adaptive chunksize.
+        """
+        with self.instrumentation.measure('send_query_chunks') as event:
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **params)
+            event.query = text
+            with self.get_connection() as conn:
+                event.rows = conn.query_chunks(text, consume, chunksize, **params)
+            return event.rows
+
+    def send_query_incremental(self, query, watermark_col='updated_at', state=None, name=None,
+                               overlap=None, key=None, cache=None, escape_percentage=None,
+                               remove_comments=None, **params):
+        """Fetch only the rows added or changed since the last call: the rows
+        with watermark_col greater than the largest value seen before. The
+        watermark is stored after the rows were fetched.
+
+        Args:
+        - query (str): the name of a table, or a query as for send_query.
+        - watermark_col (str): a column increasing with every change, e.g. a
+          timestamp or an auto increment id.
+        - state (str|FileState|TableState|None): where the watermark is
+          kept: a JSON file, a table, or None for the lifetime of the
+          Database.
+        - name (str|None): the name of the watermark in state, defaults to
+          the table name or a hash of the query.
+        - overlap (number|timedelta|None): fetch the rows down to watermark
+          - overlap again, for rows committed late with an older value. The
+          result then contains rows seen before, see key and cache. Needs a
+          numeric or datetime watermark, a string raises a ValueError; e.g.
+          pass parse_dates for timestamps in SQLite.
+        - key (str|list[str]|None): the primary key of the rows, needed for
+          cache.
+        - cache (str|None): a Jay file; the new rows are merged into it and
+          the complete result is returned. Requires datatable.
+        """
+        if cache is not None and key is None:
+            raise ValueError('a key is needed to merge into the cache')
+        if state is None:
+            state = self._watermarks
+        elif isinstance(state, str):
+            state = FileState(state)
+        if is_table(query, self.sql_dir):
+            text = query
+        else:
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **params)
+        name = name or state_name(text)
+        # Without the cached rows the increment alone is not enough.
+        last = None if cache is not None and not os.path.exists(cache) else state.get(name)
+        with self.instrumentation.measure('send_query_incremental') as event:
+            event.query = incremental_query(text, watermark_col, shift(last, overlap))
+            res = self._run_query(event.query, **params)
+            if not hasattr(res, 'shape'):
+                raise ValueError('send_query_incremental needs the complete result, '
+                                 'chunksize returns an iterator')
+            event.rows = res.shape[0]
+            new = watermark(res, watermark_col)
+            if cache is not None:
+                res = merge(cache, res, key)
+            if new is not None and (last is None or new > last):
+                state.set(name, new)
+            return res
+
+    def fetch_records(self, query, params=None, as_dict=False,
+                      escape_percentage=None, remove_comments=None, **kwargs):
+        """A fast path for small results: returns a list of tuples, or dicts
+        with as_dict=True. Skips pandas, the cache and single flight.
+
+        Args:
+        - query (str): see send_query. Arguments in kwargs are used to
+          format sql files.
+        - params (dict|None): bind parameters, e.g. {'id': 1} for ':id'.
+        - as_dict (bool): return dicts instead of tuples.
+        """
+        return self._fetch_records(
+            'fetch_records', query, params, None, as_dict, escape_percentage,
+            remove_comments, **kwargs)
+
+    def fetch_one(self, query, params=None, as_dict=False,
+                  escape_percentage=None, remove_comments=None, **kwargs):
+        """Like fetch_records, but returns only the first row or None."""
+        rows = self._fetch_records(
+            'fetch_one', query, params, 1, as_dict, escape_percentage,
+            remove_comments, **kwargs)
+        return rows[0] if rows else None
+
+    def fetch_scalar(self, query, params=None,
+                     escape_percentage=None, remove_comments=None, **kwargs):
+        """Like fetch_one, but returns only the first value or None."""
+        row = self.fetch_one(
+            query, params, False, escape_percentage, remove_comments, **kwargs)
+        return row[0] if row else None
+
+    def _fetch_records(self, phase, query, params, limit, as_dict,
+                       escape_percentage, remove_comments, **kwargs):
+        with self.instrumentation.measure(phase) as event:
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **kwargs)
+            event.query = text
+            with self.get_connection() as conn:
+                rows = conn.records(text, params, limit, as_dict)
+            event.rows = len(rows)
+            return rows
+
+    def _run_query(self, query, **params):
+        """Execute a rendered query, using single flight and the cache if configured."""
+        if self.single_flight is None:
+            return self._query_with_cache(query, **params)
+        return self.single_flight.do(
+            QueryCache.key(query, params),
+            lambda: self._query_with_cache(query, **params))
+
+    def _query_with_cache(self, query, **params):
+        if self._cache is None:
+            return self.query(query, **params)
+        return self._cached_query(query, **params)
+
+    def _cached_query(self, query, **params):
+        key = self._cache.key(self.db_url, query, params)
+        res = self._cache.get(key)
+        if res is None:
+            res = self.query(query, **params)
+            self._cache.put(key, res)
+        return res
+
+    def send_queries(self, queries, workers=4, executor='thread',
+                     escape_percentage=None, remove_comments=None, **params):
+        """Executes independent queries in parallel, each on its own connection.
+        Returns a list with the results in the order of queries.
+
+        Args:
+        - queries (list): each element may be:
+            - a query as accepted by send_query
+            - a tuple (query, dict): the dict holds parameters for this
+              query and updates params.
+        - workers (int): number of queries executed in parallel. Defaults to
+          4. For the thread executor, make sure that the pool of the engine
+          allows for as many connections.
+        - executor ({'thread', 'process'}): 'thread' shares the engine of
+          this Database. 'process' runs the queries in a pool of processes,
+          which is useful when the conversion of the result is CPU bound.
+          Each process creates its own engine: pools inherited from the parent
+          process are not used.
+        - params: passed on to send_query for all queries.
+        """
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        jobs = []
+        for query in queries:
+            query_params = params.copy()
+            if isinstance(query, tuple):
+                query, extra_params = query
+                query_params.update(extra_params)
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **query_params)
+            jobs.append((text, query_params))
+        if executor == 'thread':
+            pool = ThreadPoolExecutor(workers)
+            run = self._run_query
+        elif executor == 'process':
+            pool = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(self,))
+            run = _query_in_worker
+        else:
+            raise ValueError('{} is not a known executor'.format(executor))
+        with pool:
+            futures = [pool.submit(run, text, **query_params)
+                       for text, query_params in jobs]
+            return [future.result() for future in futures]
 
     def send_bulk_query(self, query, escape_percentage=None, remove_comments=None, **params):
         """Convenience wrapper for executing a bulk SQL-query like insert, update, create or delete
@@ -144,11 +456,13 @@ class Database(object):
             - the name of a file as string (with or without .sql)
             - a sqlalchemy selectable
         """
-        text = self.__get_query_text(
-            query, escape_percentage, remove_comments, **params)
-        return self.bulk_query(text, **params)
+        with self.instrumentation.measure('send_bulk_query') as event:
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **params)
+            event.query = text
+            return self.bulk_query(text, **params)
 
-    def send_data(self, df: DataFrame, table, mode='insert', **params):
+    def send_data(self, df, table, mode='insert', **params):
         """Sends data to table in database. If the table already exists, different modes of
         insertion are provided.
 
@@ -161,15 +475,26 @@ class Database(object):
                 - 'replace': replaces duplicate primary keys
                 - 'update': updates duplicate primary keys
         """
-        with self.transaction() as conn:
-            return conn.send_data(df, table, mode, **params)
+        with self.instrumentation.measure('send_data', table):
+            with self.transaction() as conn:
+                return conn.send_data(df, table, mode, **params)
 
     def query(self, query, **params):
         """Executes the given SQL query against the Database via pandas. Parameters can,
         optionally, be provided. Returns a pandas DataFrame.
         """
-        with self.get_connection() as conn:
-            return conn.query(query, **params)
+        conn = self.get_connection()
+        try:
+            res = conn.query(query, **params)
+        except BaseException:
+            conn.close()
+            raise
+        if hasattr(res, 'shape'):
+            conn.close()
+            return res
+        # With chunksize pandas returns an iterator, which reads from the
+        # connection until it is exhausted.
+        return _closing(res, conn)
 
     def bulk_query(self, query, **params):
         """Bulk insert or update."""
@@ -183,9 +508,33 @@ class Database(object):
         tx = conn.transaction()
         try:
             yield conn
-            tx.commit()
+            with self.instrumentation.measure('commit'):
+                tx.commit()
         except BaseException as e:
             tx.rollback()
             raise e
         finally:
             conn.close()
+
+
+# The Database of a worker process; see Database.send_queries.
+_worker_db = None
+
+
+def _closing(chunks, conn):
+    try:
+        yield from chunks
+    finally:
+        conn.close()
+
+
+def _init_worker(db):
+    global _worker_db
+    # With the fork start method, db is a copy of the parent's Database,
+    # including its pooled connections.
+    db._reset_engine()
+    _worker_db = db
+
+
+def _query_in_worker(query, **params):
+    return _worker_db._run_query(query, **params)
@@ -0,0 +1,238 @@
+"""Watermarks and caches of incremental queries, see
+Database.send_query_incremental."""
+
+import datetime
+import hashlib
+import json
+import numbers
+import os
+import re
+import uuid
+
+_IDENTIFIER = re.compile(r'^`?\w+`?(\.`?\w+`?)?$')
+
+
+class MemoryState(dict):
+    """Keeps watermarks in memory, for the lifetime of the process."""
+
+    def set(self, name, value):
+        self[name] = value
+
+
+class FileState(object):
+    """
+    Keeps watermarks in a JSON file, one entry per name.
+
+    - path (str): the file, created on the first update.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return '<FileState path={!r}>'.format(self.path)
+
+    def get(self, name):
+        return _load(self._read().get(name))
+
+    def set(self, name, value):
+        states = self._read()
+        states[name] = _dump(value)
+        tmp_file = '{}.{}.tmp'.format(self.path, uuid.uuid4().hex)
+        try:
+            with open(tmp_file, 'w') as file:
+                json.dump(states, file, indent=2, sort_keys=True)
+        except BaseException:
+            _remove(tmp_file)
+            raise
+        os.replace(tmp_file, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+
+class TableState(object):
+    """
+    Keeps watermarks in a table of a database, created on first use.
+
+    - db (Database): the database holding the table.
+    - table (str): name of the table.
+    """
+
+    def __init__(self, db, table='dbrequests_watermarks'):
+        self.db = db
+        self.table = table
+        self._created = False
+
+    def __repr__(self):
+        return '<TableState table={!r}>'.format(self.table)
+
+    def get(self, name):
+        self._create()
+        row = self.db.fetch_one(
+            'select `watermark`, `type` from `{}` where `name` = :name'.format(self.table),
+            params={'name': name})
+        return None if row is None else _load({'value': row[0], 'type': row[1]})
+
+    def set(self, name, value):
+        self._create()
+        state = _dump(value)
+        with self.db.transaction() as conn:
+            conn.bulk_query('delete from `{}` where `name` = {};'.format(self.table, literal(name)))
+            conn.bulk_query('insert into `{}` (`name`, `watermark`, `type`) values ({}, {}, {});'.format(
+                self.table, literal(name), literal(state['value']), literal(state['type'])))
+
+    def _create(self):
+        if not self._created:
+            self.db.send_bulk_query(
+                'create table if not exists `{}` (`name` varchar(255) primary key, '
+                '`watermark` varchar(255), `type` varchar(16));'.format(self.table))
+            self._created = True
+
+
+def is_table(query, sql_dir):
+    """query names a table, and not a sql file in sql_dir."""
+    return (isinstance(query, str) and _IDENTIFIER.match(query.strip()) is not None
+            and not os.path.exists(os.path.join(sql_dir, query.strip() + '.sql')))
+
+
+def incremental_query(query, column, value):
+    """
+    Select the rows of query, a table name or a query, with column greater
+    than value; all rows if value is None.
+    """
+    query = query.strip().rstrip(';')
+    if _IDENTIFIER.match(query):
+        source = '.'.join('`{}`'.format(part.strip('`')) for part in query.split('.'))
+    else:
+        source = '({}) as incremental'.format(query)
+    if value is None:
+        return 'select * from {};'.format(source)
+    return 'select * from {} where `{}` > {};'.format(source, column, literal(value))
+
+
+def state_name(query):
+    """The name of the watermark of query: the table name or a hash."""
+    query = query.strip().rstrip(';')
+    if _IDENTIFIER.match(query):
+        return query.replace('`', '')
+    return 'query_' + hashlib.md5(query.encode('utf-8')).hexdigest()
+
+
+def shift(value, overlap):
+    """Move the watermark back by overlap, to fetch late commits again."""
+    if value is None or not overlap:
+        return value
+    if isinstance(value, str):
+        # e.g. timestamps in SQLite; only the state knows whether a string is
+        # a date, an id or a version.
+        raise ValueError(
+            'overlap needs a numeric or datetime watermark, not the string {!r}; '
+            'convert the column, e.g. with parse_dates'.format(value))
+    if isinstance(value, (datetime.date, datetime.datetime)) and isinstance(overlap, numbers.Real):
+        overlap = datetime.timedelta(seconds=overlap)
+    return value - overlap
+
+
+def watermark(res, column):
+    """The maximum of column in a result, None if it is empty."""
+    if hasattr(res, 'max1'):
+        value = res[column].max1()
+    elif hasattr(res, 'iloc'):
+        value = res[column].max() if len(res) else None
+    else:
+        import pyarrow.compute as pc
+        value = pc.max(res[column]).as_py()
+    if value is not None and value != value:
+        # NaN or NaT
+        return None
+    return _plain(value)
+
+
+def merge(path, res, key):
+    """
+    Merge res into the Jay file path: rows of res replace the cached rows
+    with the same key. Returns all rows, in the type of res.
+    """
+    import datatable as dt
+
+    keys = [key] if isinstance(key, str) else list(key)
+    frame = res if isinstance(res, dt.Frame) else dt.Frame(res)
+    if os.path.exists(path):
+        names = frame.names
+        frame = dt.rbind(dt.fread(path), frame, force=True)
+        # The last row of each key is the newest one; by moves the keys to
+        # the front.
+        frame = frame[-1, :, dt.by(*keys)][:, names]
+    tmp_file = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    try:
+        frame.to_jay(tmp_file)
+    except BaseException:
+        _remove(tmp_file)
+        raise
+    os.replace(tmp_file, path)
+    if isinstance(res, dt.Frame):
+        return frame
+    if hasattr(res, 'iloc'):
+        return frame.to_pandas()
+    return frame.to_arrow()
+
+
+def literal(value):
+    """Render value as a SQL literal."""
+    value = _plain(value)
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat(sep=' ', timespec='microseconds')
+    elif isinstance(value, numbers.Real):
+        return repr(value)
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def _remove(path):
+    # The temporary file of a failed write.
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _plain(value):
+    # numpy scalars and pandas Timestamps into python objects.
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    if type(value).__module__ == 'numpy' and hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _dump(value):
+    value = _plain(value)
+    if isinstance(value, datetime.datetime):
+        return {'type': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'type': 'date', 'value': value.isoformat()}
+    if isinstance(value, numbers.Integral):
+        return {'type': 'int', 'value': str(int(value))}
+    if isinstance(value, numbers.Real):
+        return {'type': 'float', 'value': repr(float(value))}
+    return {'type': 'str', 'value': str(value)}
+
+
+def _load(state):
+    if state is None:
+        return None
+    load = {
+        'datetime': datetime.datetime.fromisoformat,
+        'date': datetime.date.fromisoformat,
+        'int': int,
+        'float': float,
+    }.get(state['type'], str)
+    return load(state['value'])
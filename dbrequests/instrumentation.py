@@ -0,0 +1,314 @@
+"""
+Instrumentation of the phases of a call: timings, row and byte counts and
+memory.
+
+A Database dispatches an Event to its hooks for every phase of a call. A hook
+is any callable accepting an Event. MetricsCollector is a hook aggregating
+the events per phase and query fingerprint.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when the memory budget of a Database is exceeded."""
+
+
+class Event(object):
+    """
+    A measured phase of a call.
+
+    - phase (str): e.g. 'render', 'execute', 'fetch', 'frame', 'to_pandas',
+      'csv', 'infile', 'diff', 'commit' or the name of the called method.
+    - query (str|None): the sql statement or the name of the table the phase
+      belongs to.
+    - seconds (float): wall time.
+    - rows (int|None): number of rows processed.
+    - bytes (int|None): number of bytes processed.
+    - error (BaseException|None): set, if the phase failed.
+    - status (dict|None): server side counters, e.g. the differences of the
+      session status in mysql; see the option session_status of
+      mysql.Database.
+    - memory (int|None): peak of memory allocated during the phase in bytes,
+      as traced by tracemalloc. Only with track_memory. Memory allocated by
+      datatable is not traced, the resident set size accounts for it.
+    - rss (int|None): resident set size of the process at the end of the
+      phase in bytes. Only with track_memory.
+    """
+
+    def __init__(self, phase, query=None, seconds=0.0, rows=None, bytes=None):
+        self.phase = phase
+        self.query = query
+        self.seconds = seconds
+        self.rows = rows
+        self.bytes = bytes
+        self.error = None
+        self.status = None
+        self.memory = None
+        self.rss = None
+
+    def __repr__(self):
+        return '<Event phase={} seconds={:.6f} rows={} bytes={}>'.format(
+            self.phase, self.seconds, self.rows, self.bytes)
+
+    @property
+    def fingerprint(self):
+        """See fingerprint()."""
+        if self.query is None:
+            return None
+        return fingerprint(self.query)
+
+
+class Instrumentation(object):
+    """
+    Measures phases and dispatches the events to hooks.
+
+    - hooks (list[callable]): each hook is called with an Event.
+    - track_memory (bool): measure the memory of each phase, see
+      Event.memory and Event.rss. This starts tracemalloc, which slows down
+      allocations considerably. Memory is measured process wide, so
+      concurrent calls inflate each others peaks.
+    - memory_budget (int|None): maximum resident set size of the process
+      in bytes. Long running phases, e.g. fetching a result, check the
+      budget regularly and raise MemoryBudgetExceeded before the operating
+      system kills the process.
+    """
+
+    def __init__(self, hooks=None, track_memory=False, memory_budget=None):
+        self.hooks = list(hooks or [])
+        self.track_memory = track_memory
+        self.memory_budget = memory_budget
+        self._local = threading.local()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __repr__(self):
+        return '<Instrumentation hooks={}>'.format(len(self.hooks))
+
+    def __getstate__(self):
+        # Hooks are local to a process and possibly not picklable.
+        return {
+            'hooks': [],
+            'track_memory': self.track_memory,
+            'memory_budget': self.memory_budget}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def add_hook(self, hook):
+        """Register a callable, it will receive every Event."""
+        self.hooks.append(hook)
+
+    @contextmanager
+    def measure(self, phase, query=None):
+        """Measure the wall time of a block, yields the Event."""
+        event = Event(phase, query)
+        if self.track_memory:
+            self._start_memory()
+        start = time.perf_counter()
+        try:
+            yield event
+        except BaseException as error:
+            event.error = error
+            raise error
+        finally:
+            event.seconds = time.perf_counter() - start
+            if self.track_memory:
+                self._stop_memory(event)
+            self.emit(event)
+
+    def check_memory(self, phase):
+        """Raise MemoryBudgetExceeded, if the memory budget is exceeded."""
+        if self.memory_budget is None:
+            return None
+        rss = current_rss()
+        if rss > self.memory_budget:
+            raise MemoryBudgetExceeded(
+                'Memory budget of {} bytes exceeded while in phase {}: {} '
+                'bytes in use. Consider fetching or sending the data in '
+                'chunks.'.format(self.memory_budget, phase, rss))
+
+    def over_budget(self):
+        """True, if the memory budget is exceeded."""
+        return (self.memory_budget is not None
+                and current_rss() > self.memory_budget)
+
+    def _start_memory(self):
+        # Phases are nested, e.g. 'fetch' within 'send_query'. tracemalloc
+        # knows only one peak, so we keep the peaks of the outer phases on a
+        # stack before resetting it.
+        stack = self._memory_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+
+    def _stop_memory(self, event):
+        stack = self._memory_stack()
+        _, peak = tracemalloc.get_traced_memory()
+        start, outer_peak = stack.pop()
+        peak = max(peak, outer_peak)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        event.memory = peak - start
+        event.rss = current_rss()
+
+    def _memory_stack(self):
+        stack = getattr(self._local, 'memory_stack', None)
+        if stack is None:
+            stack = self._local.memory_stack = []
+        return stack
+
+    def emit(self, event):
+        """Dispatch event to all hooks."""
+        for hook in self.hooks:
+            hook(event)
+
+
+class MetricsCollector(object):
+    """
+    A hook aggregating events per phase and query fingerprint.
+
+    The aggregates can be exported as Prometheus text or written to a log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.queries = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event.phase, event.fingerprint)
+        with self._lock:
+            if event.query is not None:
+                self.queries.setdefault(key[1], normalize(event.query))
+            metric = self._metrics.setdefault(key, {
+                'calls': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'rows': 0, 'bytes': 0, 'max_memory': 0, 'max_rss': 0,
+                'status': {}})
+            metric['calls'] += 1
+            metric['errors'] += event.error is not None
+            metric['seconds'] += event.seconds
+            metric['max_seconds'] = max(metric['max_seconds'], event.seconds)
+            metric['rows'] += event.rows or 0
+            metric['bytes'] += event.bytes or 0
+            metric['max_memory'] = max(metric['max_memory'], event.memory or 0)
+            metric['max_rss'] = max(metric['max_rss'], event.rss or 0)
+            for name, value in (event.status or {}).items():
+                metric['status'][name] = metric['status'].get(name, 0) + value
+
+    @property
+    def metrics(self):
+        """A dict (phase, fingerprint) -> dict of aggregates."""
+        with self._lock:
+            return {
+                key: dict(metric, status=metric['status'].copy())
+                for key, metric in self._metrics.items()}
+
+    def reset(self):
+        """Forget all collected metrics."""
+        with self._lock:
+            self._metrics.clear()
+            self.queries.clear()
+
+    def to_prometheus(self, prefix='dbrequests'):
+        """Export the metrics in the Prometheus text format."""
+        lines = []
+        metrics = self.metrics
+        for name, kind, doc in _PROMETHEUS_METRICS:
+            full_name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(full_name, doc))
+            lines.append('# TYPE {} {}'.format(full_name, kind))
+            field = name.replace('_total', '')
+            for (phase, fp), metric in sorted(metrics.items(), key=_sort_key):
+                lines.append('{}{{phase="{}",fingerprint="{}"}} {}'.format(
+                    full_name, phase, fp or '', metric[field]))
+        full_name = '{}_server_status_total'.format(prefix)
+        lines.append('# HELP {} Server side counters.'.format(full_name))
+        lines.append('# TYPE {} counter'.format(full_name))
+        for (phase, fp), metric in sorted(metrics.items(), key=_sort_key):
+            for name, value in sorted(metric['status'].items()):
+                lines.append(
+                    '{}{{phase="{}",fingerprint="{}",variable="{}"}} {}'.format(
+                        full_name, phase, fp or '', name, value))
+        return '\n'.join(lines) + '\n'
+
+    def log(self, logger=None, level=logging.INFO):
+        """Write one line per phase and fingerprint to logger."""
+        logger = logger or logging.getLogger('dbrequests')
+        for (phase, fp), metric in sorted(self.metrics.items(), key=_sort_key):
+            logger.log(
+                level,
+                'phase=%s fingerprint=%s calls=%d errors=%d seconds=%.6f '
+                'max_seconds=%.6f rows=%d bytes=%d max_memory=%d max_rss=%d '
+                'status=%s query=%s',
+                phase, fp, metric['calls'], metric['errors'],
+                metric['seconds'], metric['max_seconds'], metric['rows'],
+                metric['bytes'], metric['max_memory'], metric['max_rss'],
+                metric['status'], self.queries.get(fp))
+
+
+_PROMETHEUS_METRICS = (
+    ('calls_total', 'counter', 'Number of measured phases.'),
+    ('errors_total', 'counter', 'Number of failed phases.'),
+    ('seconds_total', 'counter', 'Wall time spent in phases.'),
+    ('max_seconds', 'gauge', 'Longest wall time of a phase.'),
+    ('rows_total', 'counter', 'Number of rows processed.'),
+    ('bytes_total', 'counter', 'Number of bytes processed.'),
+    ('max_memory', 'gauge', 'Largest peak of traced memory of a phase.'),
+    ('max_rss', 'gauge', 'Largest resident set size after a phase.'),
+)
+
+
+def _sort_key(item):
+    (phase, fp), _ = item
+    return phase, fp or ''
+
+
+def normalize(query):
+    """Replace literals in query with '?' and collapse whitespace."""
+    query = re.sub(r"'(?:[^'\\]|\\.|'')*'", '?', query)
+    query = re.sub(r'"(?:[^"\\]|\\.|"")*"', '?', query)
+    query = re.sub(r'\b\d+(?:\.\d+)?\b', '?', query)
+    query = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', query)
+    return ' '.join(query.split()).lower()
+
+
+def fingerprint(query):
+    """A short hash of the normalized query: identical up to literals."""
+    return hashlib.md5(normalize(query).encode('utf-8')).hexdigest()[:16]
+
+
+def current_rss():
+    """The resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        # Not the current, but the maximum resident set size.
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
@@ -1,2 +1,3 @@
+from .aio import AsyncDatabase
 from .connection import Connection
 from .database import Database
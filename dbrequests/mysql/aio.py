@@ -0,0 +1,20 @@
+"""Asyncio interface for MySQL databases."""
+
+from dbrequests.aio import AsyncDatabase as SuperAsyncDatabase
+
+from .database import Database as MysqlDatabase
+
+
+class AsyncDatabase(SuperAsyncDatabase):
+    """
+    Provides the methods of `dbrequests.mysql.Database` as coroutines.
+
+    Cancelling a call kills the running query on the server using 'kill
+    query'. See `dbrequests.AsyncDatabase` for details.
+    """
+
+    _database_class = MysqlDatabase
+
+    async def send_delete(self, df, table: str, mode: str = 'in_set', **params) -> int:
+        """See mysql.Database.send_delete."""
+        return await self._run('send_delete', df, table, mode, **params)
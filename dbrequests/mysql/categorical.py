@@ -0,0 +1,119 @@
+"""Dictionary encoding of string columns while fetching a result."""
+
+# Field types and flags of the MySQL protocol.
+_ENUM, _SET, _VARCHAR, _VAR_STRING, _STRING = 247, 248, 15, 253, 254
+_ENUM_FLAG, _SET_FLAG = 256, 2048
+_STRING_TYPES = (_VARCHAR, _VAR_STRING, _STRING)
+
+# With 'auto' a string column is encoded, if the first chunk has at most
+# this share of distinct values.
+AUTO_RATIO = 0.1
+
+
+class Categorical(object):
+    """
+    Encodes columns as integer codes while fetching and decodes them into
+    pandas categories.
+
+    - columns (list[str]|str): names of the columns, or 'auto': ENUM and SET
+      columns and string columns with few distinct values in the first
+      chunk.
+    """
+
+    def __init__(self, columns):
+        if columns != 'auto' and isinstance(columns, str):
+            columns = [columns]
+        self.columns = columns
+        self.categories = {}
+        self._candidates = None
+
+    def describe(self, cursor):
+        """Find the columns to encode from the description of cursor."""
+        names = [column[0] for column in cursor.description]
+        if self.columns != 'auto':
+            unknown = set(self.columns) - set(names)
+            if unknown:
+                raise ValueError('unknown categorical columns: {}'.format(sorted(unknown)))
+            self.categories = {name: _Codes() for name in self.columns}
+            return None
+        self._candidates = []
+        for name, type_code, flags in zip(names, _type_codes(cursor), _flags(cursor)):
+            if type_code in (_ENUM, _SET) or flags & (_ENUM_FLAG | _SET_FLAG):
+                self.categories[name] = _Codes()
+            elif type_code in _STRING_TYPES:
+                self._candidates.append(name)
+
+    def to_frame(self, rows, names):
+        """Build a Frame from rows, with codes for categorical columns."""
+        from datatable import Frame, int32
+
+        columns = list(map(list, zip(*rows)))
+        if self._candidates:
+            for i, name in enumerate(names):
+                if name in self._candidates and len(set(columns[i])) <= AUTO_RATIO * len(rows):
+                    self.categories[name] = _Codes()
+            self._candidates = None
+        types = {}
+        for i, name in enumerate(names):
+            codes = self.categories.get(name)
+            if codes is not None:
+                columns[i] = list(map(codes.__getitem__, columns[i]))
+                types[name] = int32
+        return Frame(columns, names=names, types=types)
+
+    def to_pandas(self, frame):
+        """Convert frame into a DataFrame with categories."""
+        from pandas import Categorical as PandasCategorical
+
+        df = frame.to_pandas()
+        for name, codes in self.categories.items():
+            if frame.nrows == 0:
+                # An empty result has no codes.
+                df[name] = df[name].astype('category')
+            else:
+                df[name] = PandasCategorical.from_codes(df[name].values, codes.categories)
+        return df
+
+
+def categorize(df, columns):
+    """
+    Convert columns of a DataFrame into categories after the fact, e.g. for
+    results read from a cache. With 'auto' object columns with few distinct
+    values are converted.
+    """
+    if columns == 'auto':
+        columns = [
+            name for name in df.columns
+            if df[name].dtype == object and df[name].nunique() <= AUTO_RATIO * len(df)]
+    elif isinstance(columns, str):
+        columns = [columns]
+    return df.astype({name: 'category' for name in columns})
+
+
+class _Codes(dict):
+    """Maps values to codes, new values get the next code. None is -1."""
+
+    def __init__(self):
+        super().__init__({None: -1})
+
+    def __missing__(self, value):
+        code = self[value] = len(self) - 1
+        return code
+
+    @property
+    def categories(self):
+        return [value for value in self if value is not None]
+
+
+def _type_codes(cursor):
+    return [column[1] for column in cursor.description]
+
+
+def _flags(cursor):
+    # MySQLdb exposes the flags of the columns, for pymysql we have to look
+    # into the result.
+    flags = getattr(cursor, 'description_flags', None)
+    if flags is None:
+        fields = getattr(getattr(cursor, '_result', None), 'fields', None)
+        flags = [field.flags for field in fields] if fields else []
+    return list(flags) + [0] * (len(cursor.description) - len(flags))
@@ -1,30 +1,173 @@
 """
 Implements the backend for MySQL databases. This is mysql and mariadb
 compliant.
+
+datatable is imported within the methods using it, so that importing this
+module stays cheap.
 """
 
 import logging
+import os
 import re
+import sys
+import time
 from contextlib import contextmanager
-from inspect import getfullargspec as getargs
 
-from datatable import Frame, dt, f, join, rbind, str64
 from dbrequests import Connection as SuperConnection
+from dbrequests.connection import argnames
+from dbrequests.instrumentation import Event, fingerprint
 from dbrequests.temp_file import temp_file
 
+from .categorical import Categorical
+from .converters import ColumnConverter, raw_conversions
+from .output import ARROW_FORMATS, concat_batches, from_arrow, output_format, record_batch, to_frame
+from .readers import csv_header, file_format, read_chunks, read_frame
+from .snapshot import Snapshot, remove_keys
+from .spill import Spill
+from .writers import writer
+
 
 class Connection(SuperConnection):
     """A Database connection."""
 
-    def send_delete(self, df: Frame, table: str, mode: str, **params) -> int:
+    # Set by mysql.Database, see the option session_status.
+    track_session_status = False
+    # Set by mysql.Database: query and the other methods using _fetch get
+    # DECIMAL, DATE, DATETIME, TIMESTAMP and JSON as text, they are converted
+    # per chunk.
+    bulk_convert = False
+    # Set by mysql.Database with result_history=True: the number of rows of
+    # past results per query fingerprint, used to pick the cursor.
+    result_sizes = None
+    # Snapshots staged by the diffs modes, published by mysql.Database after
+    # the commit.
+    snapshots = None
+
+    # Results with at most this many rows are read with a buffered cursor.
+    buffered_rows = 10000
+    # Without an explicit chunksize, the first chunk has this many rows, the
+    # following hold about chunk_memory bytes.
+    first_chunksize = 1000
+    chunk_memory = 64 * 2 ** 20
+
+    # Server side counters compared before and after a call.
+    session_status_variables = (
+        "Bytes_received",
+        "Bytes_sent",
+        "Created_tmp_disk_tables",
+        "Created_tmp_tables",
+        "Handler_delete",
+        "Handler_read_first",
+        "Handler_read_key",
+        "Handler_read_next",
+        "Handler_read_rnd",
+        "Handler_read_rnd_next",
+        "Handler_update",
+        "Handler_write",
+        "Innodb_rows_deleted",
+        "Innodb_rows_inserted",
+        "Innodb_rows_read",
+        "Innodb_rows_updated",
+        "Rows_read",
+        "Select_full_join",
+        "Select_scan",
+        "Sort_rows",
+    )
+
+    def send_delete(self, df: "Frame", table: str, mode: str, **params) -> int:
         """See mysql.Database.send_delete for documentation."""
         mode_implementation = "_send_delete_{}".format(mode)
-        if hasattr(self, mode_implementation):
-            affected_rows = getattr(self, mode_implementation)(df, table, **params)
-        else:
-            raise ValueError("{} is not a known mode".format(mode))
+        with self._session_status_delta(table):
+            if hasattr(self, mode_implementation):
+                affected_rows = getattr(self, mode_implementation)(df, table, **params)
+            else:
+                raise ValueError("{} is not a known mode".format(mode))
         return affected_rows
 
+    def send_data(self, df, table, mode="insert", **params):
+        """See mysql.Database.send_data for documentation."""
+        with self._session_status_delta(table):
+            return super().send_data(df, table, mode, **params)
+
+    def send_file(self, path, table, mode="insert", format=None, **params):
+        """See mysql.Database.send_file for documentation."""
+        format = file_format(path, format)
+        with self._session_status_delta(table):
+            if format == "csv" and mode in ("insert", "replace", "update", "truncate", "delete"):
+                return self._send_csv(path, table, mode, **params)
+            if mode.endswith("_diffs") or mode == "update_columns":
+                # The differences are computed on all rows at once.
+                return self.send_data(read_frame(path, format), table, mode, **params)
+            return self.send_data(read_chunks(path, format), table, mode, **params)
+
+    def _send_csv(self, path, table, mode, **params):
+        # The file is loaded as it is, the header names the columns. Empty
+        # fields are NULL. truncate table commits implicitly, so 'truncate'
+        # deletes the rows and the load can be rolled back.
+        logging.info(f"sending file with {mode}: {path}")
+        names = csv_header(path)
+        if mode in ("truncate", "delete"):
+            self.bulk_query("delete from {table};".format(table=table))
+        if mode != "update":
+            return self._infile_csv(
+                path, names, table, replace="replace" if mode == "replace" else "", header=True, nullif=True
+            )
+        with self._temporary_table(table, names, params.pop("with_temp", True)) as tmp_table:
+            self._infile_csv(path, names, tmp_table, header=True, nullif=True)
+            self._insert_update(names, table, tmp_table)
+
+    def bulk_query(self, query, **params):
+        """Bulk insert or update."""
+        with self._session_status_delta(query):
+            return super().bulk_query(query, **params)
+
+    @contextmanager
+    def _session_status_delta(self, query):
+        """
+        Emit an Event with phase 'server' holding the difference of the
+        session status variables before and after the block. Nested blocks
+        are not measured. The statement reading the status is accounted for.
+        """
+        if not self.track_session_status or getattr(self, "_in_status_delta", False):
+            yield
+            return None
+        self._in_status_delta = True
+        try:
+            overhead = self._session_status_overhead()
+            before = self._session_status()
+            start = time.perf_counter()
+            yield
+            seconds = time.perf_counter() - start
+            after = self._session_status()
+        finally:
+            self._in_status_delta = False
+        event = Event("server", query, seconds=seconds)
+        event.status = {
+            name: after[name] - before[name] - overhead.get(name, 0) for name in after if name in before
+        }
+        self.instrumentation.emit(event)
+
+    def _session_status(self):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "show session status where variable_name in ({});".format(
+                    ", ".join("'{}'".format(name) for name in self.session_status_variables)
+                )
+            )
+            return {name: int(value) for name, value in cursor.fetchall()}
+
+    def _session_status_overhead(self):
+        # Reading the status changes some of the counters, e.g. Handler_write
+        # or Bytes_sent. We measure this once per DBAPI connection: info lives
+        # as long as the connection in the pool, not just this wrapper.
+        overhead = self._conn.info.get("dbrequests_status_overhead")
+        if overhead is None:
+            first = self._session_status()
+            second = self._session_status()
+            overhead = {name: second[name] - first[name] for name in second if name in first}
+            self._conn.info["dbrequests_status_overhead"] = overhead
+        return overhead
+
     def _send_delete_in_set(self, df, table, **params):
         with self._temporary_table(table, df.names, params.pop("with_temp", True)) as tmp_table:
             self._send_data_insert(df, tmp_table)
@@ -62,6 +205,8 @@ class Connection(SuperConnection):
             return self._delete_join(table, tmp_table, df.names, False)
 
     def _send_delete_in_delete_col(self, df, table, **params):
+        from datatable import f
+
         logging.info(f"delete {df.shape[0]} rows")
         if df.shape[0] > 0:
             df = df[:, f[:].extend({"delete": 1})]
@@ -90,13 +235,13 @@ class Connection(SuperConnection):
         logging.info(f"sending data with insert: {df.shape[0]} rows")
         with temp_file() as tf:
             self._write_csv(df, tf)
-            self._infile_csv(tf, df, table)
+            self._infile_csv(tf, df.names, table)
 
     def _send_data_replace(self, df, table):
         logging.info(f"sending data with replace: {df.shape[0]} rows")
         with temp_file() as tf:
             self._write_csv(df, tf)
-            self._infile_csv(tf, df, table, replace="replace")
+            self._infile_csv(tf, df.names, table, replace="replace")
 
     def _send_data_truncate(self, df, table):
         logging.info(f"sending data with truncate: {df.shape[0]} rows")
@@ -113,25 +258,46 @@ class Connection(SuperConnection):
         with_temp = params.pop("with_temp", True)
         with self._temporary_table(table, df.names, with_temp) as tmp_table:
             self._send_data_insert(df, tmp_table)
-            self._insert_update(df, table, tmp_table)
+            self._insert_update(df.names, table, tmp_table)
+
+    def _send_chunks(self, chunks, table, mode, **params):
+        if mode == "truncate":
+            # truncate table commits implicitly; a later chunk failing would
+            # leave the table truncated and partly loaded.
+            mode = "delete"
+        if mode != "update":
+            return super()._send_chunks(chunks, table, mode, **params)
+        # All chunks are loaded into one temporary table, followed by one
+        # insert ... on duplicate key update.
+        first = next(chunks, None)
+        if first is None:
+            return None
+        with self._temporary_table(table, first.names, params.pop("with_temp", True)) as tmp_table:
+            self._send_data_insert(first, tmp_table)
+            for chunk in chunks:
+                self._send_data_insert(chunk, tmp_table)
+            self._insert_update(first.names, table, tmp_table)
 
     def _send_data_update_diffs(self, df, table, **params):
         logging.info(f"sending data with update_diffs: {df.shape[0]} rows")
         remote_table = self._get_diff_table(df, table, **params)
         diffs = self._make_diffs(df, remote_table, **params)
         self._send_data_update(diffs, table, **params)
+        self._stage_snapshot(table, diffs, "update", **params)
 
     def _send_data_insert_diffs(self, df, table, **params):
         logging.info(f"sending data with insert_diffs: {df.shape[0]} rows")
         remote_table = self._get_diff_table(df, table, **params)
         diffs = self._make_diffs(df, remote_table, **params)
         self._send_data_insert(diffs, table)
+        self._stage_snapshot(table, diffs, "insert", **params)
 
     def _send_data_replace_diffs(self, df, table, **params):
         logging.info(f"sending data with replace_diffs: {df.shape[0]} rows")
         remote_table = self._get_diff_table(df, table, **params)
         diffs = self._make_diffs(df, remote_table, **params)
         self._send_data_replace(diffs, table)
+        self._stage_snapshot(table, diffs, "replace", **params)
 
     def _send_data_sync_diffs(self, df, table, **params):
         logging.info(f"sending data with sync_diffs: {df.shape[0]} rows")
@@ -140,6 +306,44 @@ class Connection(SuperConnection):
         diffb = self._make_diffs(remote_table, df, keys=self._get_primary_key(table), **params)
         self._send_delete_in_delete_col(diffb, table, **params)
         self._send_data_replace(diffa, table)
+        self._stage_snapshot(table, diffa, "replace", deleted=diffb, **params)
+
+    def _send_data_update_columns(self, df, table, **params):
+        # Like update_diffs, but rows with an existing primary key only
+        # update the columns which changed. Rows with the same changed
+        # columns are sent together.
+        from datatable import by, count, f, join
+
+        logging.info(f"sending data with update_columns: {df.shape[0]} rows")
+        params.pop("keys", None)
+        pk = self._get_primary_key(table)
+        if not pk:
+            raise ValueError(f"mode 'update_columns' needs a primary key in {table}")
+        remote_table = _unkeyed(self._get_diff_table(df, table, **params))
+        diffs = _unkeyed(self._make_diffs(df, remote_table, **params))
+        new = remove_keys(diffs, remote_table, pk)
+        self._send_data_insert(new, table)
+        changed = _unkeyed(remove_keys(diffs, new, pk))
+        cols = [name for name in df.names if name not in pk]
+        if changed.shape[0] > 0 and cols:
+            with self.instrumentation.measure("diff") as event:
+                remote_table = remote_table[:, pk + cols]
+                remote_table.names = pk + ["_old_" + name for name in cols]
+                remote_table.key = pk
+                changed = changed[:, :, join(remote_table)]
+                flags = changed[:, {"_changed_" + name: f[name] != f["_old_" + name] for name in cols}]
+                changed.cbind(flags)
+                patterns = flags[:, count(), by(*flags.names)]
+                event.rows = patterns.shape[0]
+            for pattern in zip(*patterns[:, flags.names].to_list()):
+                changed_cols = [name for name, flag in zip(cols, pattern) if flag]
+                if not changed_cols:
+                    continue
+                rows = True
+                for name, flag in zip(flags.names, pattern):
+                    rows &= f[name] == flag
+                self._send_data_update(changed[rows, pk + changed_cols], table, **params)
+        self._stage_snapshot(table, diffs, "update", **params)
 
     def _write_csv(self, df, file):
         # Before writing, we need to convert all columns to strings for two
@@ -151,18 +355,33 @@ class Connection(SuperConnection):
         #   NULL value. See #30
         # - We have to check if the frame is empty. If so we have to
         #   circumvent a  bug in datatable: see #36
+        from datatable import f, str64
+
         if df.shape[0] == 0:
             return None
-        df = df[:, f[:].remove(f[:]).extend(str64(f[:]))][:, df.names]
-        df.replace(None, "NULL")
-        df.to_csv(path=file, header=False)
-
-    def _infile_csv(self, file, df, table, replace=""):
+        self.instrumentation.check_memory("csv")
+        with self.instrumentation.measure("csv") as event:
+            df = df[:, f[:].remove(f[:]).extend(str64(f[:]))][:, df.names]
+            df.replace(None, "NULL")
+            df.to_csv(path=file, header=False)
+            event.rows = df.shape[0]
+            event.bytes = os.path.getsize(file)
+
+    def _infile_csv(self, file, names, table, replace="", header=False, nullif=False):
         # On Windows paths are denoted by '\\'. A backslash in the sql statement
         # has to be escaped; so we have to escape both of them -> 4 backslashes.
         # In the regular expression every backslash, of those 4, needs to be
         # escaped, leading to 8. This should be without effect on Linux.
         file = re.sub("\\\\", "\\\\\\\\", file)
+        columns, assign = self._sql_cols(names), ""
+        if nullif:
+            # Empty fields, as written by e.g. datatable for missing values,
+            # are NULL instead of '' or 0.
+            variables = ["@_{}".format(i) for i in range(len(names))]
+            columns = ", ".join(variables)
+            assign = "set " + ", ".join(
+                "`{}` = nullif({}, '')".format(name, var) for name, var in zip(names, variables)
+            )
         query = """
         load data local infile '{path}'
         {replace}
@@ -172,22 +391,28 @@ class Connection(SuperConnection):
         optionally enclosed by '\"'
         escaped by ''
         lines terminated by '\\n'
-        ({columns});""".format(
+        {ignore}
+        ({columns})
+        {assign};""".format(
                 path=file,
                 replace=replace,
                 table=table,
-                columns=self._sql_cols(df.names),
+                ignore="ignore 1 lines" if header else "",
+                columns=columns,
+                assign=assign,
             )
-        self.bulk_query(query)
+        with self.instrumentation.measure("infile", query) as event:
+            event.bytes = os.path.getsize(file)
+            event.rows = self.bulk_query(query)
 
-    def _insert_update(self, df, table, tmp_table):
+    def _insert_update(self, names, table, tmp_table):
         self.bulk_query(
             """
         insert into `{table}` ({columns})
         select {columns}
         from `{tmp_table}`
         on duplicate key update {update};""".format(
-                table=table, columns=self._sql_cols(df.names), tmp_table=tmp_table, update=self._sql_update(df)
+                table=table, columns=self._sql_cols(names), tmp_table=tmp_table, update=self._sql_update(names)
             )
         )
 
@@ -197,50 +422,257 @@ class Connection(SuperConnection):
         return cols
 
     @staticmethod
-    def _sql_update(df):
-        stmt = ", ".join(["`{name}`=values(`{name}`)".format(name=str(name)) for name in df.names])
+    def _sql_update(names):
+        stmt = ", ".join(["`{name}`=values(`{name}`)".format(name=str(name)) for name in names])
         return stmt
 
     def query(self, query, **params):
         """
         Executes the given SQL query against the connected dsatabase.
         """
-        chunksize = params.pop("chunksize", 100000)
-        to_pandas = params.pop("to_pandas", True)
-        with self._cursor() as cursor:
-            params = {k: v for k, v in params.items() if k in getargs(cursor.execute).args}
-            cursor.execute(query, **params)
-            fields = [i[0] for i in cursor.description]
+        from datatable import Frame, rbind
+
+        with self._session_status_delta(query):
+            chunksize = params.pop("chunksize", None)
+            to = output_format(params)
+            encoder = self._categorical(params.pop("categorical", None), to)
+            if to in ARROW_FORMATS:
+                return self._query_arrow(query, to, chunksize, **params)
+            spill_dir = params.pop("spill_dir", None)
+            spill = Spill(spill_dir, params.pop("max_memory", None)) if spill_dir else None
             res = []
-            while True:
-                result = cursor.fetchmany(chunksize)
-                if not result:
-                    break
-                res.append(Frame(result))
-        frame = rbind(res, bynames=False)
-        if frame.shape == (0, 0):
-            frame = Frame({n: [] for n in fields})
+
+            def consume(chunk):
+                res.append(chunk)
+                if spill is not None and (spill.due(res) or self.instrumentation.over_budget()):
+                    with self.instrumentation.measure("spill", query):
+                        spill.write(res)
+                else:
+                    self.instrumentation.check_memory("fetch")
+
+            if encoder is None:
+                fields = self._fetch(query, chunksize, consume, **params)
+            else:
+                fields = self._fetch(
+                    query, chunksize, consume, convert=encoder.to_frame, describe=encoder.describe, **params
+                )
+            with self.instrumentation.measure("frame", query) as event:
+                if spill is not None and spill.parts:
+                    frame = spill.frame(res)
+                elif res:
+                    frame = rbind(res, bynames=False)
+                else:
+                    frame = Frame({n: [] for n in fields})
+                del res[:]
+                event.rows = frame.shape[0]
+            self.instrumentation.check_memory("frame")
+            if to == "pandas":
+                with self.instrumentation.measure("to_pandas", query) as event:
+                    frame = frame.to_pandas() if encoder is None else encoder.to_pandas(frame)
+                    event.rows = frame.shape[0]
+            return frame
+
+    @staticmethod
+    def _categorical(columns, to):
+        if not columns:
+            return None
+        if to != "pandas":
+            raise ValueError("categorical is only supported for to='pandas', got {!r}".format(to))
+        return Categorical(columns)
+
+    def _query_arrow(self, query, to, chunksize, **params):
+        # Every chunk is converted into a RecordBatch, strings are never
+        # converted to python objects in a pandas DataFrame.
+        if params.pop("spill_dir", None) is not None:
+            raise ValueError("spill_dir is not supported for to={!r}".format(to))
+        batches = []
+
+        def consume(batch):
+            batches.append(batch)
+            self.instrumentation.check_memory("fetch")
+
+        fields = self._fetch(query, chunksize, consume, convert=record_batch, **params)
+        with self.instrumentation.measure("arrow", query) as event:
+            table = concat_batches(batches, fields)
+            del batches[:]
+            event.rows = table.num_rows
+        if to == "arrow":
+            return table
+        with self.instrumentation.measure("to_pandas" if to == "pandas_arrow" else "to_polars", query) as event:
+            res = from_arrow(table, to)
+            event.rows = res.shape[0]
+        return res
+
+    def query_to_file(self, query, path, format=None, **params):
+        """
+        Writes the result of query to path, chunk by chunk.
+
+        Returns the number of written rows and bytes.
+        """
+        with self._session_status_delta(query):
+            chunksize = params.pop("chunksize", None)
+            rows = 0
+            with writer(path, format) as file:
+
+                def consume(chunk):
+                    nonlocal rows
+                    with self.instrumentation.measure("write", query) as event:
+                        file.write(chunk)
+                        event.rows = chunk.nrows
+                    rows += chunk.nrows
+
+                fields = self._fetch(query, chunksize, consume, **params)
+                size = file.close(fields)
+            return rows, size
+
+    def query_chunks(self, query, consume, chunksize=None, **params):
+        """
+        Executes query and calls consume with a Frame for every chunk. A
+        server side cursor is used unless buffered=True is given. Returns the
+        number of rows.
+        """
+        params.setdefault("buffered", False)
+        with self._session_status_delta(query):
+            rows = 0
+
+            def count(chunk):
+                nonlocal rows
+                rows += chunk.nrows
+                consume(chunk)
+
+            self._fetch(query, chunksize, count, **params)
+            return rows
+
+    def _fetch(self, query, chunksize, consume, convert=to_frame, describe=None, **params):
+        # Executes query and calls consume with convert(rows, names), a Frame
+        # by default, for every chunk of the result. describe is called with
+        # the cursor before fetching. Returns the names of the columns.
+        # Without a chunksize, it is derived from the size of the first chunk.
+        chunk_memory = params.pop("chunk_memory", self.chunk_memory)
+        cursorclass = self._cursorclass(query, params.pop("buffered", None))
+        with self._conversions(), self._cursor(cursorclass) as cursor:
+            params = {k: v for k, v in params.items() if k in argnames(type(cursor).execute)}
+            with self.instrumentation.measure("execute", query):
+                cursor.execute(query, **params)
+            fields = [i[0] for i in cursor.description]
+            if describe is not None:
+                describe(cursor)
+            converter = ColumnConverter(cursor.description) if self.bulk_convert else None
+            # Fetching includes the conversion of each chunk into a Frame,
+            # so the measured memory is the one of the fetch buffers.
+            with self.instrumentation.measure("fetch", query) as event:
+                event.rows = 0
+                size = chunksize or self.first_chunksize
+                while True:
+                    result = cursor.fetchmany(size)
+                    if not result:
+                        break
+                    event.rows += len(result)
+                    chunk = convert(result, fields)
+                    if converter is not None:
+                        chunk = converter(chunk)
+                    if chunksize is None:
+                        size = self._adapt_chunksize(chunk, len(result), chunk_memory)
+                    del result
+                    consume(chunk)
+                    del chunk
+            if self.result_sizes is not None:
+                if len(self.result_sizes) > 10000:
+                    self.result_sizes.clear()
+                self.result_sizes[fingerprint(query)] = event.rows
+        return fields
+
+    @staticmethod
+    def _adapt_chunksize(chunk, rows, chunk_memory):
+        # The number of rows which fit into chunk_memory; within bounds.
+        nbytes = getattr(chunk, "nbytes", None) or sys.getsizeof(chunk)
+        chunksize = int(chunk_memory * rows / max(nbytes, 1))
+        return min(max(chunksize, 1000), 1000000)
+
+    def _cursorclass(self, query, buffered):
+        # A buffered cursor reads the whole result in one go and releases the
+        # connection on the server. This is cheaper for small results, an
+        # unbuffered SSCursor is needed for large ones.
+        if buffered is None:
+            buffered = self._small_result(query)
+        if not buffered:
+            return None
+        if self._conn.dialect.driver == "mysqldb":
+            from MySQLdb.cursors import Cursor
         else:
-            frame.names = fields
-        if to_pandas:
-            frame = frame.to_pandas()
-        return frame
+            from pymysql.cursors import Cursor
+        return Cursor
+
+    def _small_result(self, query):
+        limit = re.search(r"\blimit\s+(\d+)(?:\s*,\s*(\d+))?(?:\s+offset\s+\d+)?\s*;?\s*$", query, re.I)
+        if limit:
+            return int(limit.group(2) or limit.group(1)) <= self.buffered_rows
+        if self.result_sizes is not None:
+            rows = self.result_sizes.get(fingerprint(query))
+            return rows is not None and rows <= self.buffered_rows
+        return False
+
+    def _get_diff_table(self, df, table, keys=None, in_range=None, snapshot_dir=None, snapshot_check="count", **params):
+        from datatable import dt, f
 
-    def _get_diff_table(self, df, table, keys=None, in_range=None, **params):
         if keys is None:
             keys = df.names
         if in_range:
-            where = "where `{col}` >= {min} and `{col}` <= {max}".format(
-                col=in_range,
-                min=df[:, dt.min(f[in_range])][0, 0],
-                max=df[:, dt.max(f[in_range])][0, 0],
-            )
+            low = df[:, dt.min(f[in_range])][0, 0]
+            high = df[:, dt.max(f[in_range])][0, 0]
+            where = "where `{col}` >= {min} and `{col}` <= {max}".format(col=in_range, min=low, max=high)
         else:
             where = ""
+        if snapshot_dir is not None:
+            res = self._load_snapshot(df, table, snapshot_dir, snapshot_check).frame
+            if in_range:
+                res = res[(f[in_range] >= low) & (f[in_range] <= high), :]
+            return res
         query = "select {cols} from {table} {where};".format(cols=self._sql_cols(keys), table=table, where=where)
         res = self.query(query, to_pandas=False, **params)
         return res
 
+    def _load_snapshot(self, df, table, directory, check):
+        # The snapshot is used if it has the columns of df and the table
+        # still has the same number of rows, or checksum; otherwise the
+        # table is read.
+        snapshot = Snapshot(directory, table, check)
+        rows = self.records("select count(*) from {table};".format(table=table))[0][0]
+        checksum = self._checksum(table) if check == "checksum" else None
+        if not snapshot.load(df.names, rows, checksum):
+            logging.info(f"reading {table} for a new snapshot")
+            snapshot.frame = self.query(
+                "select {cols} from {table};".format(cols=self._sql_cols(df.names), table=table), to_pandas=False
+            )
+        if self.snapshots is None:
+            self.snapshots = []
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def _stage_snapshot(self, table, diffs, mode, deleted=None, snapshot_dir=None, **params):
+        # The rows of the table after the commit: the snapshot without the
+        # deleted rows and with the diffs.
+        from datatable import rbind
+
+        if snapshot_dir is None:
+            return None
+        snapshot = [snapshot for snapshot in self.snapshots if snapshot.table == table][-1]
+        keys = self._get_primary_key(table) or diffs.names
+        with self.instrumentation.measure("snapshot", table) as event:
+            frame, diffs = _unkeyed(snapshot.frame), _unkeyed(diffs)
+            if deleted is not None:
+                frame = remove_keys(frame, deleted, keys)
+            if mode == "insert":
+                # Rows with existing keys are skipped by load data.
+                frame = rbind(frame, remove_keys(diffs, frame, keys), force=True)
+            else:
+                frame = rbind(remove_keys(frame, diffs, keys), diffs, force=True)
+            snapshot.stage(frame)
+            event.rows = frame.nrows
+
+    def _checksum(self, table):
+        return self.records("checksum table {table};".format(table=table))[0][1]
+
     def _get_primary_key(self, table):
         query = f"""SHOW INDEXES FROM {table}
         where key_name = 'PRIMARY'
@@ -253,31 +685,58 @@ class Connection(SuperConnection):
         return pk
 
     def _make_diffs(self, dfa, dfb, keys=None, **params):
+        from datatable import f, join
+
         if keys is None:
             keys = dfa.names
-        if dfb.shape[0] > 0:
-            # prepare the data
-            dfa.key = keys
-            dfb = dfb[:, keys]  # we only need the keys to find diffs
-            dfb = dfb[:, f[:].extend({"_a_": 1})]
-            dfb.key = keys
-            # remove the duplicates from dfa
-            diffs = dfa[:, :, join(dfb)]
-            del diffs[f._a_ == 1, :]
-            del diffs[:, "_a_"]
-            del dfb[:, "_a_"]
-        else:
-            # return dfa if dfb is empty
-            diffs = dfa
+        with self.instrumentation.measure("diff") as event:
+            if dfb.shape[0] > 0:
+                # prepare the data
+                dfa.key = keys
+                dfb = dfb[:, keys]  # we only need the keys to find diffs
+                dfb = dfb[:, f[:].extend({"_a_": 1})]
+                dfb.key = keys
+                # remove the duplicates from dfa
+                diffs = dfa[:, :, join(dfb)]
+                del diffs[f._a_ == 1, :]
+                del diffs[:, "_a_"]
+                del dfb[:, "_a_"]
+            else:
+                # return dfa if dfb is empty
+                diffs = dfa
+            event.rows = diffs.shape[0]
 
         return diffs
 
     @contextmanager
-    def _cursor(self):
-        cursor = self._conn.connection.cursor()
+    def _conversions(self):
+        # With bulk_convert, results of _fetch hold DECIMAL, DATE, DATETIME,
+        # TIMESTAMP and JSON as text, they are converted per chunk.
+        if not self.bulk_convert:
+            yield
+            return None
+        fairy = self._conn.connection
+        with raw_conversions(getattr(fairy, "dbapi_connection", None) or fairy.connection):
+            yield
+
+    @contextmanager
+    def _cursor(self, cursorclass=None):
+        # pymysql and MySQLdb both take the class of the cursor positionally.
+        if cursorclass is None:
+            cursor = self._conn.connection.cursor()
+        else:
+            cursor = self._conn.connection.cursor(cursorclass)
         try:
             yield cursor
         except BaseException as error:
             raise error
         finally:
             cursor.close()
+
+
+def _unkeyed(frame):
+    # Keyed frames, e.g. after _make_diffs, can't be extended with rbind.
+    if frame.key:
+        frame = frame.copy()
+        frame.key = None
+    return frame
@@ -0,0 +1,122 @@
+"""
+Column wise conversion of DECIMAL, DATE, DATETIME, TIMESTAMP and JSON.
+
+The drivers convert every value of these types into a python object, e.g. a
+Decimal or a datetime. With bulk conversion the driver returns them as text
+and they are converted for a whole chunk at once.
+"""
+
+import json
+from contextlib import contextmanager
+
+# Field types of the MySQL protocol.
+DECIMAL, NEWDECIMAL, DATE, DATETIME, TIMESTAMP, JSON = 0, 246, 10, 12, 7, 245
+TYPES = (DECIMAL, NEWDECIMAL, DATE, DATETIME, TIMESTAMP, JSON)
+
+
+@contextmanager
+def raw_conversions(dbapi_conn):
+    """
+    Within the block the driver returns the bulk converted types as text.
+    Other calls on the connection keep the conversions of the driver.
+
+    - dbapi_conn: a pymysql or MySQLdb connection.
+    """
+    if hasattr(dbapi_conn, 'decoders'):
+        # pymysql: without a converter the value is decoded to str.
+        attribute = 'decoders'
+        conv = {key: value for key, value in dbapi_conn.decoders.items() if key not in TYPES}
+    else:
+        # MySQLdb reads the converter when a result is created.
+        attribute = 'converter'
+        conv = dict(dbapi_conn.converter)
+        for field_type in TYPES:
+            conv[field_type] = _text
+    original = getattr(dbapi_conn, attribute)
+    setattr(dbapi_conn, attribute, conv)
+    try:
+        yield
+    finally:
+        setattr(dbapi_conn, attribute, original)
+
+
+class ColumnConverter(object):
+    """
+    Converts the text columns of a chunk according to their field types.
+
+    Decimals become float64 in a Frame and decimal128 in arrow, dates date32,
+    datetimes and timestamps time64 or timestamp[us]; zero dates become
+    NULL. JSON is decoded in one call per chunk into python objects in a
+    Frame and stays text in arrow.
+
+    - description: the description of the cursor.
+    """
+
+    def __init__(self, description):
+        self.columns = {
+            i: (column[1], column[4], column[5])
+            for i, column in enumerate(description) if column[1] in TYPES}
+
+    def __call__(self, chunk):
+        if not self.columns:
+            return chunk
+        if type(chunk).__module__.startswith('datatable'):
+            return self._convert_frame(chunk)
+        return self._convert_batch(chunk)
+
+    def _convert_frame(self, frame):
+        import datatable as dt
+
+        columns = [frame[:, i] for i in range(frame.ncols)]
+        for i, (field_type, _, _) in self.columns.items():
+            column = columns[i]
+            if column.stype not in (dt.stype.str32, dt.stype.str64):
+                continue
+            if field_type == JSON:
+                columns[i] = dt.Frame([_loads(column.to_list()[0])], names=column.names, types=[dt.obj64])
+                continue
+            # Zero dates can't be parsed and become NA.
+            columns[i] = column[:, dt.as_type(dt.f[0], _frame_type(field_type))]
+            columns[i].names = frame.names[i:i + 1]
+        return dt.cbind(columns)
+
+    def _convert_batch(self, batch):
+        import pyarrow
+        import pyarrow.compute as pc
+
+        arrays = batch.columns
+        for i, (field_type, precision, scale) in self.columns.items():
+            array = arrays[i]
+            if array.type != pyarrow.string() or field_type == JSON:
+                continue
+            if field_type in (DATE, DATETIME, TIMESTAMP):
+                array = pc.if_else(pc.starts_with(array, '0000'), pyarrow.scalar(None, pyarrow.string()), array)
+            if field_type in (DECIMAL, NEWDECIMAL):
+                precision = precision or 38
+                decimal = pyarrow.decimal128 if precision <= 38 else pyarrow.decimal256
+                arrow_type = decimal(precision, scale or 0)
+            elif field_type == DATE:
+                arrow_type = pyarrow.date32()
+            else:
+                arrow_type = pyarrow.timestamp('us')
+            arrays[i] = pc.cast(array, arrow_type)
+        return pyarrow.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def _frame_type(field_type):
+    import datatable as dt
+
+    if field_type == DATE:
+        return dt.Type.date32
+    if field_type in (DATETIME, TIMESTAMP):
+        return dt.Type.time64
+    return dt.Type.float64
+
+
+def _loads(values):
+    # One call of the C decoder per chunk instead of one per value.
+    return json.loads('[' + ','.join('null' if value is None else value for value in values) + ']')
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
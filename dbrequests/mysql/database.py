@@ -1,10 +1,15 @@
+import logging
+import os
 import re
+import time
 
-from datatable import Frame
-
+from dbrequests.connection import as_chunks
 from dbrequests.database import Database as SuperDatabase
 
+from .categorical import categorize
 from .connection import Connection as MysqlConnection
+from .output import ARROW_FORMATS, from_arrow, from_frame, output_format
+from .readers import slices
 
 
 class Database(SuperDatabase):
@@ -24,20 +29,69 @@ class Database(SuperDatabase):
     For reading data, we (1) use server side cursors and (2) use datatables
     Frame to optimize the memory consumption. For raw speed you may want to use
     the mysqldb driver, which can be 10x faster than the pymysql driver.
+    With `bulk_convert=True` DECIMAL, DATE, DATETIME, TIMESTAMP and JSON
+    values are fetched as text and converted per chunk and column instead of
+    per value: decimals become float64 (decimal128 with to='arrow'),
+    temporals date32 or time64 and JSON is decoded into python objects.
+    Only the fetching of results does so; e.g. fetch_scalar returns a
+    Decimal or a datetime as usual.
+    Small results, judged by a LIMIT clause, are read with a buffered cursor
+    instead; use `send_query(query, buffered=True|False)` to pick the cursor
+    yourself. With `result_history=True` a query is also buffered if the last
+    result of the same query fingerprint was small. Fingerprints ignore
+    literals, so only use it if queries of the same shape have results of
+    similar size.
+    Without a chunksize, the rows per fetch adapt to the width of the rows,
+    see `Connection.chunk_memory`.
+    Results larger than memory can be spilled to disk with
+    `send_query(query, to_pandas=False, spill_dir=..., max_memory=...)`:
+    fetched chunks are written to Jay files in spill_dir once they exceed
+    max_memory bytes, or the memory budget, and the result is memory mapped.
+
+    **Server side costs**
+    With `session_status=True` the session status (Handler_*, Innodb_rows_*,
+    Bytes_sent, ...) is read before and after every query, bulk_query,
+    send_data and send_delete. The differences are emitted to the hooks as
+    an Event with phase 'server', see `Event.status`. This costs two
+    additional round trips per call, and two more once per connection of the
+    pool to measure the cost of reading the status itself. Note that some counters, e.g.
+    Innodb_rows_read, are global in MySQL.
     """
 
     _connection_class = MysqlConnection
+    # send_data converts larger pandas DataFrames in slices of this many rows,
+    # in these modes.
+    send_chunk_rows = 100000
+    _sliced_modes = ('insert', 'truncate', 'delete', 'replace', 'update')
+
+    def __init__(self, *args, session_status=False, bulk_convert=False, result_history=False, **kwargs):
+        self._session_status = session_status
+        self._bulk_convert = bulk_convert
+        self._result_sizes = {} if result_history else None
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self):
+        conn = super().get_connection()
+        conn.track_session_status = self._session_status
+        conn.bulk_convert = self._bulk_convert
+        conn.result_sizes = self._result_sizes
+        return conn
 
     def _init_engine(self, **kwargs):
         connect_args = kwargs.pop('connect_args', {})
         # This option is needed for send data via csv: #20
         connect_args['local_infile'] = connect_args.get('local_infile', 1)
+        super()._init_engine(connect_args=connect_args, **kwargs)
+
+    def _create_engine(self, connect_args, **kwargs):
         # This option is needed for memory efficient send query: #22
         # mysqldb can be difficult to install, so we also support
         # pymysql. Depending on the driver we pick the apropriate cursorclass.
+        # We do this here and not in _init_engine, so that the driver is not
+        # imported before the first connection is made.
         connect_args['cursorclass'] = connect_args.get(
             'cursorclass', self._pick_cursorclass(self.db_url))
-        super()._init_engine(connect_args=connect_args, **kwargs)
+        return super()._create_engine(connect_args=connect_args, **kwargs)
 
     def send_data(self, df, table, mode='insert', **params):
         """Sends df to table in database.
@@ -50,7 +104,8 @@ class Database(SuperDatabase):
             - 'insert': appends data. Duplicates in the
             primary keys are not replaced.
             - 'truncate': drop the table, recreate it, then insert. No
-            rollback on error.
+            rollback on error. Data sent in chunks or slices, see below,
+            is loaded after a 'delete' instead.
             - 'delete': delete all rows in the table, then insert. This
             operation can be rolled back on error, but can be very
             expensive.
@@ -63,6 +118,10 @@ class Database(SuperDatabase):
               expect few changes in your data. 'sync' will not only update new
               rows, but will also delete rows; this has the same effect as a
               truncate.
+            - 'update_columns': like 'update_diffs', but existing rows only
+              update the columns which changed. Rows are grouped by the set of
+              changed columns, one update per group. Needs a primary key;
+              keys is ignored, in_range and snapshot_dir apply.
               - keys (str|list[str]|None): defaults to None. Columns to
                 identify unique values and find differences. None is the
                 default and uses all columns.
@@ -71,11 +130,62 @@ class Database(SuperDatabase):
                 the amount of data we have to pull down to construct diffs.
               - chunksize (int): defaults to 10 million. We pull data in chunks
                 and remove duplicates from the dataset.
+              - snapshot_dir (str|None): keep a Jay snapshot of the table in
+                this directory and compute the diffs against it instead of
+                reading the table. Only for tables no one else writes to. The
+                snapshot is updated after the commit and is used as long as
+                the number of rows of the table matches.
+              - snapshot_check ('count'|'checksum'): 'checksum' also compares
+                the result of CHECKSUM TABLE, which reads the whole table on
+                the server but detects updates.
+
+        A pandas DataFrame with more than send_chunk_rows rows is sent in
+        slices of send_chunk_rows rows, except for the '_diffs' modes, so
+        that only one slice at a time is copied into a Frame. A pyarrow Table
+        is not copied as a whole in the first place.
+
+        df may also be an iterator, e.g. a generator, or a list of data
+        frames. Each chunk is converted and sent with its own LOAD DATA
+        statement, so only one chunk is held in memory. All chunks are sent
+        within one transaction, so 'truncate' deletes the rows, like 'delete',
+        and an error in any chunk rolls back the whole load. With 'update' all
+        chunks are loaded into one temporary table. 'sync_diffs' needs all
+        data at once and raises a ValueError.
         """
-        if not isinstance(df, Frame):
-            df = Frame(df)
-        with self.transaction() as conn:
-            return conn.send_data(df, table, mode, **params)
+        from datatable import Frame
+
+        with self.instrumentation.measure('send_data', table):
+            chunks = as_chunks(df)
+            if chunks is None and not isinstance(df, Frame) and mode in self._sliced_modes:
+                chunks = slices(df, self.send_chunk_rows)
+            if chunks is not None:
+                df = (chunk if isinstance(chunk, Frame) else self._to_frame(chunk, table) for chunk in chunks)
+            elif not isinstance(df, Frame):
+                df = self._to_frame(df, table)
+            conn = None
+            try:
+                with self.transaction() as conn:
+                    res = conn.send_data(df, table, mode, **params)
+            except BaseException:
+                for snapshot in getattr(conn, 'snapshots', None) or []:
+                    snapshot.discard()
+                raise
+            self._publish_snapshots(conn.snapshots or [])
+            return res
+
+    def _publish_snapshots(self, snapshots):
+        # Replace the snapshots of the diffs modes once the data is committed.
+        # The data is committed at this point, so errors are not raised; the
+        # snapshot is invalidated and the table is read the next time.
+        for snapshot in snapshots:
+            try:
+                checksum = None
+                if snapshot.check == 'checksum':
+                    checksum = self.fetch_records('checksum table {};'.format(snapshot.table))[0][1]
+                snapshot.publish(checksum)
+            except Exception as error:
+                logging.warning('could not update the snapshot %s: %s', snapshot.path, error)
+                snapshot.invalidate()
 
     def send_delete(self, df, table: str, mode: str = 'in_set', **params) -> int:
         """
@@ -100,10 +210,111 @@ class Database(SuperDatabase):
             and then sends a delete statement. This can have more pretictable
             performance compared to 'in_join'.
         """
-        if not isinstance(df, Frame):
+        from datatable import Frame
+
+        with self.instrumentation.measure('send_delete', table):
+            if not isinstance(df, Frame):
+                df = self._to_frame(df, table)
+            with self.transaction() as conn:
+                return conn.send_delete(df, table, mode, **params)
+
+    def send_file(self, path, table, mode='insert', format=None, **params):
+        """
+        Send the rows of a file to table, without reading it into memory
+        where possible.
+
+        - path (str): a CSV, Jay or Parquet file.
+        - table (str): name of the table.
+        - mode (str): see send_data.
+        - format ({'csv', 'jay', 'parquet'}|None): defaults to the extension
+          of path.
+        - params: see send_data.
+
+        CSV files are loaded as they are with LOAD DATA LOCAL INFILE, the
+        header names the columns. They have to be comma separated, quoted
+        with '"' and use '\\n' as line ending, e.g. written by datatable's
+        to_csv. Empty fields, also quoted empty strings, are loaded as NULL.
+        With mode 'truncate' the rows are deleted instead, so the load is
+        rolled back on error.
+        Jay files are memory mapped and Parquet files are read one row group
+        at a time; they are sent in chunks, see send_data. The '_diffs'
+        modes and 'update_columns' need all rows at once, and also read CSV
+        files into a Frame.
+        """
+        with self.instrumentation.measure('send_file', table) as event:
+            event.bytes = os.path.getsize(path)
+            with self.transaction() as conn:
+                return conn.send_file(path, table, mode, format, **params)
+
+    def send_query_to_file(self, query, path, format=None, escape_percentage=None,
+                           remove_comments=None, **params):
+        """
+        Write the result of a query to a file, without holding it in memory.
+
+        Chunks of the result are fetched and appended to the file, with a
+        server side cursor unless the result is small, see send_query and
+        buffered=True|False. The file is replaced once the query is
+        complete.
+
+        - query (str): see send_query.
+        - path (str): the file to write.
+        - format ({'csv', 'jay', 'parquet'}|None): defaults to the extension
+          of path. Parquet requires pyarrow. Jay files are assembled from
+          parts in the directory of path.
+        - params: parameters for sql files and 'chunksize', the number of
+          rows per chunk. Defaults to a chunksize adapting to the width of
+          the rows, see Connection.chunk_memory.
+
+        Returns a dict with the number of rows and bytes written, the
+        seconds and the throughput in rows and bytes per second.
+        """
+        with self.instrumentation.measure('send_query_to_file') as event:
+            start = time.perf_counter()
+            text = self._get_query_text(
+                query, escape_percentage, remove_comments, **params)
+            event.query = text
+            with self.get_connection() as conn:
+                rows, size = conn.query_to_file(text, path, format, **params)
+            event.rows = rows
+            event.bytes = size
+            seconds = time.perf_counter() - start
+        return {
+            'rows': rows,
+            'bytes': size,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds,
+            'bytes_per_second': size / seconds}
+
+    def _to_frame(self, df, table):
+        from datatable import Frame
+
+        with self.instrumentation.measure('frame', table) as event:
             df = Frame(df)
-        with self.transaction() as conn:
-            return conn.send_delete(df, table, mode, **params)
+            event.rows = df.shape[0]
+        return df
+
+    def _cached_query(self, query, **params):
+        # We cache the Frame: it is stored as Jay file and memory mapped when
+        # read from the cache. The formats built from Arrow cache the Arrow
+        # Table, a Frame would lose e.g. the decimal types.
+        to = output_format(params)
+        categorical = params.pop('categorical', None)
+        if categorical and to != 'pandas':
+            raise ValueError(
+                "categorical is only supported for to='pandas', got {!r}".format(to))
+        if to in ARROW_FORMATS:
+            return from_arrow(super()._cached_query(query, to='arrow', **params), to)
+        frame = super()._cached_query(query, to_pandas=False, **params)
+        res = from_frame(frame, to)
+        if categorical:
+            res = categorize(res, categorical)
+        return res
+
+    def _cancel(self, conn):
+        """Kill the query running on conn using a second connection."""
+        thread_id = conn._conn.connection.thread_id()
+        with self.get_connection() as killer:
+            killer.bulk_query('kill query {};'.format(thread_id))
 
     @staticmethod
     def _pick_cursorclass(url):
@@ -114,9 +325,13 @@ class Database(SuperDatabase):
         want to pass the cursorclass to the create_engine function and hence
         need to extract it beforhand.
         """
-        driver = re.findall(r'mysqldb|pymysql', url)[0]
-        if driver == 'mysqldb':
+        if Database._driver(url) == 'mysqldb':
             from MySQLdb.cursors import SSCursor
         else:
             from pymysql.cursors import SSCursor
         return SSCursor
+
+    @staticmethod
+    def _driver(url):
+        """The name of the driver in url: 'mysqldb' or 'pymysql'."""
+        return re.findall(r'mysqldb|pymysql', url)[0]
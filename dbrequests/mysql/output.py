@@ -0,0 +1,72 @@
+"""Output formats of query results: datatable, pandas, arrow and polars."""
+
+FORMATS = ('pandas', 'datatable', 'arrow', 'polars', 'pandas_arrow')
+ARROW_FORMATS = ('arrow', 'polars', 'pandas_arrow')
+
+
+def output_format(params):
+    """
+    Pop 'to' and 'to_pandas' from params and return the output format.
+
+    'to' takes precedence; to_pandas=False is the same as to='datatable'.
+    """
+    to = params.pop('to', None)
+    to_pandas = params.pop('to_pandas', True)
+    if to is None:
+        to = 'pandas' if to_pandas else 'datatable'
+    if to not in FORMATS:
+        raise ValueError('to must be one of {}, got {!r}'.format(FORMATS, to))
+    return to
+
+
+def to_frame(rows, names):
+    """Build a datatable Frame from fetched rows."""
+    from datatable import Frame
+
+    return Frame(rows, names=names)
+
+
+def record_batch(rows, names):
+    """Build a pyarrow RecordBatch from fetched rows."""
+    import pyarrow
+
+    columns = list(zip(*rows))
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column) for column in columns], names=names)
+
+
+def concat_batches(batches, names):
+    """Combine record batches, their types may differ, into a Table."""
+    import pyarrow
+
+    if not batches:
+        return pyarrow.table(
+            {name: pyarrow.array([], pyarrow.null()) for name in names})
+    tables = [pyarrow.Table.from_batches([batch]) for batch in batches]
+    try:
+        # A column only holding None in one chunk has the null type,
+        # decimals can have a different precision in every chunk.
+        return pyarrow.concat_tables(tables, promote_options='permissive')
+    except TypeError:
+        # pyarrow < 14
+        return pyarrow.concat_tables(tables, promote=True)
+
+
+def from_arrow(table, to):
+    """Convert a pyarrow Table into one of ARROW_FORMATS."""
+    if to == 'arrow':
+        return table
+    if to == 'polars':
+        import polars
+        return polars.from_arrow(table)
+    from pandas import ArrowDtype
+    return table.to_pandas(types_mapper=ArrowDtype)
+
+
+def from_frame(frame, to):
+    """Convert a datatable Frame into the output format `to`."""
+    if to == 'datatable':
+        return frame
+    if to == 'pandas':
+        return frame.to_pandas()
+    return from_arrow(frame.to_arrow(), to)
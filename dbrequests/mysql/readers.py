@@ -0,0 +1,68 @@
+"""Reading files and data frames for send_file and send_data, one chunk at a time."""
+
+import csv
+import os
+
+FORMATS = ('csv', 'jay', 'parquet')
+
+# Jay files are memory mapped and sent in slices of this many rows.
+CHUNK_ROWS = 1000000
+
+
+def file_format(path, format=None):
+    """The format of path, defaults to its extension."""
+    format = format or os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in FORMATS:
+        raise ValueError('format must be one of {}, got {!r}'.format(FORMATS, format))
+    return format
+
+
+def csv_header(path):
+    """The column names in the first line of a CSV file."""
+    with open(path, newline='', encoding='utf-8') as file:
+        return next(csv.reader(file), [])
+
+
+def read_chunks(path, format, rows=CHUNK_ROWS):
+    """
+    Yield Frames of a file: slices of a memory mapped Jay file, the row
+    groups of a Parquet file or a CSV file as a whole.
+    """
+    from datatable import Frame, fread
+
+    if format == 'parquet':
+        from pyarrow import parquet
+
+        file = parquet.ParquetFile(path)
+        if file.metadata.num_rows == 0:
+            # Frame would drop the columns of an empty table.
+            yield Frame({name: [] for name in file.schema_arrow.names})
+            return None
+        for i in range(file.num_row_groups):
+            yield Frame(file.read_row_group(i))
+        return None
+    frame = fread(path)
+    if format == 'csv' or frame.nrows <= rows:
+        yield frame
+        return None
+    for start in range(0, frame.nrows, rows):
+        yield frame[start:start + rows, :]
+
+
+def read_frame(path, format):
+    """Read a file into one Frame, Jay files are memory mapped."""
+    from datatable import fread, rbind
+
+    if format == 'parquet':
+        return rbind(list(read_chunks(path, format)))
+    return fread(path)
+
+
+def slices(df, rows):
+    """
+    Row slices of a pandas DataFrame with at most rows rows. None for other
+    data and for data frames with at most rows rows.
+    """
+    if type(df).__module__.split('.')[0] != 'pandas' or not hasattr(df, 'iloc') or len(df) <= rows:
+        return None
+    return (df.iloc[start:start + rows] for start in range(0, len(df), rows))
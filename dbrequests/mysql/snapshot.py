@@ -0,0 +1,122 @@
+"""Local snapshots of tables for the diffs modes of send_data."""
+
+import json
+import os
+import re
+import uuid
+
+CHECKS = ('count', 'checksum')
+
+
+class Snapshot(object):
+    """
+    The rows of a table as last sent, in a Jay file in directory. A JSON
+    file next to it holds the columns, the number of rows and, with
+    check='checksum', the checksum of the table after the last commit.
+
+    - directory (str): where snapshots are kept.
+    - table (str): name of the table.
+    - check ({'count', 'checksum'}): how the snapshot is validated against
+      the table: by the number of rows, or also by CHECKSUM TABLE, which
+      reads the whole table on the server.
+    """
+
+    def __init__(self, directory, table, check='count'):
+        if check not in CHECKS:
+            raise ValueError('snapshot_check must be one of {}, got {!r}'.format(CHECKS, check))
+        name = re.sub(r'[^\w.]', '_', table)
+        self.table = table
+        self.check = check
+        self.path = os.path.join(directory, name + '.jay')
+        self.meta_path = os.path.join(directory, name + '.json')
+        self.frame = None
+        self._staged = None
+
+    def __repr__(self):
+        return '<Snapshot path={!r}>'.format(self.path)
+
+    def load(self, names, rows, checksum=None):
+        """
+        Memory map the snapshot into frame, if it has the columns names and
+        the table has rows rows and checksum. Returns True on success.
+        """
+        from datatable import fread
+
+        meta = self._read_meta()
+        if meta is None or not os.path.exists(self.path):
+            return False
+        if meta['names'] != list(names) or meta['rows'] != rows or meta.get('checksum') != checksum:
+            return False
+        frame = fread(self.path)
+        if frame.nrows != rows:
+            return False
+        self.frame = frame
+        return True
+
+    def stage(self, frame):
+        """Write frame next to the snapshot, it replaces it on publish."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_file = '{}.{}.tmp'.format(self.path, uuid.uuid4().hex)
+        # Set first, so that discard also removes a partially written file.
+        self._staged = (tmp_file, {'names': list(frame.names), 'rows': frame.nrows})
+        frame.to_jay(tmp_file)
+
+    def publish(self, checksum=None):
+        """Replace the snapshot with the staged one, after a commit."""
+        if self._staged is None:
+            return None
+        tmp_file, meta = self._staged
+        meta['checksum'] = checksum
+        # Without the meta data a half replaced snapshot is never used.
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        os.replace(tmp_file, self.path)
+        tmp_meta = '{}.{}.tmp'.format(self.meta_path, uuid.uuid4().hex)
+        with open(tmp_meta, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp_meta, self.meta_path)
+        self._staged = None
+
+    def discard(self):
+        """Remove the staged snapshot, after a rollback."""
+        if self._staged is not None:
+            if os.path.exists(self._staged[0]):
+                os.remove(self._staged[0])
+            self._staged = None
+
+    def invalidate(self):
+        """
+        Discard the staged snapshot and remove the meta data of the current
+        one, so that the table is read the next time.
+        """
+        paths = [self.meta_path]
+        if self._staged is not None:
+            paths.append(self._staged[0])
+            self._staged = None
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+def remove_keys(frame, other, keys):
+    """The rows of frame with keys not in other."""
+    from datatable import by, count, f, isna, join
+
+    if frame.nrows == 0 or other.nrows == 0:
+        return frame
+    # A join needs unique keys.
+    other = other[:, {'_in_': count()}, by(*keys)]
+    other.key = keys
+    res = frame[:, :, join(other)]
+    res = res[isna(f._in_), :]
+    del res[:, '_in_']
+    return res
@@ -0,0 +1,86 @@
+"""Spilling of query results to memory mapped Jay files."""
+
+import os
+import sys
+import uuid
+
+
+class Spill(object):
+    """
+    Collects the chunks of a result on disk instead of in memory.
+
+    Chunks are written to Jay files in `path`. The final Frame is assembled
+    column by column, so that at most one column of the result is held in
+    memory, and is memory mapped from a single Jay file.
+
+    - path (str): the directory for the files. Is created if it does not
+      exist.
+    - max_memory (int|None): number of bytes of chunks which may be held in
+      memory before they are written to disk. None means every chunk is
+      written immediately.
+    """
+
+    def __init__(self, path, max_memory=None):
+        self.path = path
+        self.max_memory = max_memory
+        self.parts = []
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return '<Spill path={} parts={}>'.format(self.path, len(self.parts))
+
+    def due(self, chunks):
+        """True, if chunks exceed max_memory."""
+        if self.max_memory is None:
+            return True
+        return sum(sys.getsizeof(chunk) for chunk in chunks) > self.max_memory
+
+    def write(self, chunks):
+        """Write chunks to disk and remove them from the list."""
+        while chunks:
+            file = self._file()
+            chunks.pop(0).to_jay(file)
+            self.parts.append(file)
+
+    def frame(self, chunks):
+        """Combine the written parts and chunks into a memory mapped Frame."""
+        from datatable import fread
+
+        result = self._file()
+        self.to_jay(chunks, result)
+        frame = fread(result)
+        # On POSIX the mapping survives removing the file, the space is freed
+        # with the Frame.
+        _remove(result)
+        return frame
+
+    def to_jay(self, chunks, file):
+        """Combine the written parts and chunks into the Jay file `file`."""
+        from datatable import cbind, fread, rbind
+
+        self.write(chunks)
+        columns = []
+        try:
+            parts = [fread(part) for part in self.parts]
+            for i in range(parts[0].ncols):
+                column = rbind([part[:, i] for part in parts], bynames=False)
+                columns.append(self._file())
+                column.to_jay(columns[-1])
+                del column
+            del parts
+            cbind([fread(column) for column in columns]).to_jay(file)
+        finally:
+            for part in self.parts + columns:
+                _remove(part)
+            self.parts = []
+
+    def _file(self):
+        return os.path.join(self.path, 'dbrequests-{}.jay'.format(uuid.uuid4().hex))
+
+
+def _remove(file):
+    try:
+        os.remove(file)
+    except OSError:
+        # On Windows memory mapped files can't be removed.
+        pass
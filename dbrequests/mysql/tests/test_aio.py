@@ -0,0 +1,77 @@
+"""Testing the asyncio interface."""
+
+import asyncio
+import time
+
+import pytest
+from dbrequests.mysql import AsyncDatabase
+from dbrequests.mysql.tests.conftest import CREDS
+from dbrequests.mysql.tests.conftest import set_up_cats as reset
+
+
+@pytest.fixture(scope='module', params=['pymysql', 'mysqldb'])
+def adb(request):
+    """Create instances of async database connections."""
+    creds = CREDS.copy()
+    creds['driver'] = request.param
+    adb = AsyncDatabase(creds, max_workers=4)
+    try:
+        yield adb
+    finally:
+        adb.close()
+
+
+class TestAsyncDatabase:
+    """Coroutines mirror the methods of the Database."""
+
+    def test_send_query(self, adb):
+        """Concurrent queries return their own results."""
+        reset(adb.database)
+
+        async def query_all():
+            return await asyncio.gather(*[
+                adb.send_query('select * from cats where id = {}'.format(i))
+                for i in range(1, 4)])
+
+        res = asyncio.run(query_all())
+        assert [df.name[0] for df in res] == ['Sandy', 'Cookie', 'Charlie']
+
+    def test_send_data_and_delete(self, adb):
+        """Write and delete data."""
+        reset(adb.database)
+        asyncio.run(adb.send_data(
+            {'name': ['Chill'], 'owner': ['Alex'], 'birth': ['2018-03-03']},
+            'cats'))
+        nrows = asyncio.run(adb.send_delete({'id': [4]}, 'cats', 'in_set'))
+        res = asyncio.run(adb.send_query('select count(*) as n from cats'))
+        assert nrows == 1
+        assert res.n[0] == 3
+
+    def test_cancel_kills_query(self, adb):
+        """A cancelled call stops the query on the server."""
+
+        async def sleep():
+            await asyncio.wait_for(adb.send_query('select sleep(30) as x'), 1)
+
+        start = time.time()
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(sleep())
+        time.sleep(1)
+        res = adb.database.send_query(
+            "select count(*) as n from information_schema.processlist "
+            "where info like 'select sleep(30)%'")
+        assert res.n[0] == 0
+        assert time.time() - start < 10
+
+    def test_cancel_skips_closed_connection(self, adb, monkeypatch):
+        """A connection already back in the pool is not killed."""
+        from dbrequests.aio import _Call
+
+        killed = []
+        monkeypatch.setattr(adb.database, '_cancel', killed.append)
+        conn = adb.database.get_connection()
+        call = _Call(None, (), {})
+        call.connections.append(conn)
+        conn.close()
+        adb._cancel(call)
+        assert killed == []
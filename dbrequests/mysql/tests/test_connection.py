@@ -2,6 +2,8 @@
 
 import pandas as pd
 import pytest
+from dbrequests.mysql import Database
+from dbrequests.mysql.tests.conftest import CREDS
 from dbrequests.mysql.tests.conftest import set_up_cats as reset
 from sqlalchemy.exc import InternalError, OperationalError
 
@@ -27,3 +29,52 @@ class TestConnectionWithConnectArgs:
         reset(db_connect_args)
         with pytest.raises((InternalError, OperationalError)):
             db_connect_args.send_data(df_add, 'cats', mode='insert')
+
+
+class TestSessionStatus:
+    """Server side costs are measured with session_status=True."""
+
+    def test_full_scan(self):
+        """A full table scan shows up in Handler_read_rnd_next."""
+        events = []
+        creds = CREDS.copy()
+        with Database(creds, session_status=True, hooks=[events.append]) as db:
+            reset(db)
+            del events[:]
+            db.send_query('select * from cats')
+        server = [event for event in events if event.phase == 'server']
+        assert len(server) == 1
+        assert server[0].status['Handler_read_rnd_next'] >= 3
+        assert server[0].status['Bytes_sent'] > 0
+
+
+class TestAdaptiveCursor:
+    """The cursor is picked per call."""
+
+    @pytest.mark.parametrize('query, buffered', [
+        ('select * from cats limit 2', True),
+        ('select * from cats limit 10, 20000', False),
+        ('select * from cats where id = 1', False),
+    ])
+    def test_limit(self, query, buffered):
+        from dbrequests.mysql import Connection
+        conn = Connection.__new__(Connection)
+        assert conn._small_result(query) is buffered
+
+    def test_history(self):
+        """A query is buffered, when its last result was small."""
+        with Database(CREDS.copy()) as db:
+            db.send_query('select * from cats where id > 0')
+            with db.get_connection() as conn:
+                assert not conn._small_result('select * from cats where id > 1')
+        with Database(CREDS.copy(), result_history=True) as db:
+            reset(db)
+            query = 'select * from cats where id > {}'
+            with db.get_connection() as conn:
+                assert not conn._small_result(query.format(0))
+            db.send_query(query.format(0))
+            with db.get_connection() as conn:
+                assert conn._small_result(query.format(1))
+            res = db.send_query(query.format(1))
+            assert res.shape == (2, 4)
+            assert db.send_query(query.format(0), buffered=True).shape == (3, 4)
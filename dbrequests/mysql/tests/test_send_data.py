@@ -1,6 +1,9 @@
 """Testing send_data functionality."""
 
+import os
 import time
+
+import datatable as dt
 import pandas as pd
 import pytest
 import numpy as np
@@ -8,6 +11,7 @@ from dbrequests.mysql.tests.conftest import set_up_cats as reset
 from dbrequests.mysql.tests.conftest import (
     set_up_membership as reset_membership,
     set_up_diffs as reset_diffs)
+from dbrequests import MetricsCollector
 from sqlalchemy.exc import OperationalError, InternalError
 
 
@@ -93,6 +97,81 @@ class TestSendDataDiffs:
         # The test is, that the program does not freeze:
         assert True
 
+    @pytest.mark.parametrize('check', ['count', 'checksum'])
+    def test_snapshot(self, db, tmp_path, check):
+        """Diffs against a local snapshot instead of the table."""
+        reset_diffs(db)
+        snapshot_dir = str(tmp_path)
+        df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'value': ['a', 'b', 'c']
+        })
+        db.send_data(df, 'diffs', mode='insert_diffs', snapshot_dir=snapshot_dir, snapshot_check=check)
+        assert sorted(os.listdir(snapshot_dir)) == ['diffs.jay', 'diffs.json']
+
+        df = pd.DataFrame({
+            'id': [2, 3, 4],
+            'value': ['B', 'c', 'd']
+        })
+        db.send_data(df, 'diffs', mode='sync_diffs', snapshot_dir=snapshot_dir, snapshot_check=check)
+        res = db.send_query('select id, value from diffs order by id')
+        assert res.to_dict('list') == {'id': [2, 3, 4], 'value': ['B', 'c', 'd']}
+        snapshot = dt.fread(os.path.join(snapshot_dir, 'diffs.jay'))
+        assert sorted(snapshot.to_list()[1]) == ['B', 'c', 'd']
+
+        # Another writer invalidates the snapshot, the table is read again.
+        db.send_bulk_query("insert into diffs (id, value) values (5, 'e');")
+        db.send_data(df, 'diffs', mode='replace_diffs', snapshot_dir=snapshot_dir, snapshot_check=check)
+        snapshot = dt.fread(os.path.join(snapshot_dir, 'diffs.jay'))
+        assert snapshot.nrows == 4
+
+    def test_update_columns(self, db):
+        """Only changed columns are updated, new rows are inserted."""
+        reset(db)
+        df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['Sandy', 'Biscuit', 'Tiger'],
+            'owner': ['Alex', 'Casey', 'Sam']
+        })
+        db.send_data(df, 'cats', mode='update_columns')
+        res = db.send_query('select id, name, owner from cats where id in (1, 2, 3) order by id')
+        assert res.to_dict('list') == df.to_dict('list')
+
+        reset_diffs(db)
+        df = pd.DataFrame({
+            'id': [1, 2],
+            'value': ['a', 'b']
+        })
+        db.send_data(df, 'diffs', mode='insert')
+        df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'value': ['a', 'B', 'c']
+        })
+        db.send_data(df, 'diffs', mode='update_columns')
+        res = db.send_query('select id, value from diffs order by id')
+        assert res.to_dict('list') == df.to_dict('list')
+
+    def test_update_columns_statements(self, db):
+        """Each update names the primary key and the changed columns only."""
+        import re
+        reset(db)
+        events = []
+        db.instrumentation.add_hook(events.append)
+        try:
+            db.send_data(pd.DataFrame({
+                'id': [1, 2, 3],
+                'name': ['Sandy', 'Biscuit', 'Tiger'],
+                'owner': ['Alex', 'Casey', 'Sam']
+            }), 'cats', mode='update_columns')
+        finally:
+            db.instrumentation.hooks.remove(events.append)
+        updates = [
+            event.query for event in events
+            if event.phase == 'execute' and 'on duplicate key update' in (event.query or '')]
+        columns = sorted(
+            re.search(r'insert into `cats` \(([^)]*)\)', query).group(1) for query in updates)
+        assert columns == ['`id`, `name`', '`id`, `name`, `owner`', '`id`, `owner`']
+
     def test_with_system_versioned_table(self, db):
         """
         We check that we can send data using the temporary tables context
@@ -292,6 +371,109 @@ class TestSendDataUpdate:
         assert (df_expected == df_out).all(axis=None)
 
 
+@pytest.mark.usefixtures('db')
+class TestSendDataChunks:
+    """Tests for sending an iterator of data frames."""
+
+    @staticmethod
+    def chunks():
+        yield pd.DataFrame({
+            'id': [1, 4],
+            'name': ['Chill', 'Pi'],
+            'owner': ['Alex', 'Matt'],
+            'birth': ['2018-03-03', '2019-08-05']
+        })
+        yield pd.DataFrame({
+            'id': [5],
+            'name': ['Tiger'],
+            'owner': ['Sam'],
+            'birth': ['2020-01-01']
+        })
+
+    def test_send_chunks_truncate(self, db):
+        """Only the first chunk truncates the table."""
+        reset(db)
+        db.send_data(self.chunks(), 'cats', mode='truncate')
+        df_out = db.query("SELECT id FROM cats order by id;")
+        assert df_out.id.to_list() == [1, 4, 5]
+
+    def test_send_chunks_update(self, db):
+        """All chunks are updated at once."""
+        reset(db)
+        db.send_data(self.chunks(), 'cats', mode='update')
+        df_out = db.query("SELECT id, name FROM cats order by id;")
+        assert df_out.id.to_list() == [1, 2, 3, 4, 5]
+        assert df_out.name.to_list() == ['Chill', 'Cookie', 'Charlie', 'Pi', 'Tiger']
+
+    def test_send_data_frame_slices(self, db):
+        """A large DataFrame is sent in slices."""
+        df = pd.concat(list(self.chunks()))
+        reset(db)
+        db.send_chunk_rows = 2
+        try:
+            db.send_data(df, 'cats', mode='update')
+        finally:
+            del db.send_chunk_rows
+        df_out = db.query("SELECT id, name FROM cats order by id;")
+        assert df_out.name.to_list() == ['Chill', 'Cookie', 'Charlie', 'Pi', 'Tiger']
+
+    def test_send_chunks_sync_diffs(self, db):
+        """Chunks can't be synchronized."""
+        reset(db)
+        with pytest.raises(ValueError):
+            db.send_data(self.chunks(), 'cats', mode='sync_diffs')
+        df_nrow = db.query("SELECT count(*) as nrows FROM cats;")
+        assert df_nrow.nrows[0] == 3
+
+
+@pytest.mark.usefixtures('db')
+class TestSendFile:
+    """Tests for send_file."""
+
+    @pytest.mark.parametrize('format', ['csv', 'jay', 'parquet'])
+    @pytest.mark.parametrize('mode', ['insert', 'update', 'truncate', 'update_diffs'])
+    def test_send_file(self, db, tmp_path, format, mode):
+        """Every format in the modes without and with a temporary table."""
+        import datatable as dt
+        df = dt.Frame({
+            'id': [4, 5],
+            'name': ['Pi', 'Tiger'],
+            'owner': ['Matt', 'Sam'],
+            'birth': ['2019-08-05', '2020-01-01']
+        })
+        path = str(tmp_path / ('cats.' + format))
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(df.to_arrow(), path, row_group_size=1)
+        else:
+            getattr(df, 'to_' + format)(path)
+
+        reset(db)
+        db.send_file(path, 'cats', mode=mode)
+        df_out = db.query("SELECT id FROM cats order by id;")
+        expected = [4, 5] if mode == 'truncate' else [1, 2, 3, 4, 5]
+        assert df_out.id.to_list() == expected
+
+    @pytest.mark.parametrize('mode', ['insert', 'update'])
+    def test_send_csv_missing_values(self, db, tmp_path, mode):
+        """Missing values in a CSV written by datatable arrive as NULL."""
+        import datatable as dt
+        path = str(tmp_path / 'membership.csv')
+        dt.Frame({
+            'id': [2, 3],
+            'membership': ['{"a": 1}', None],
+            'average': [None, 1.5]
+        }).to_csv(path)
+
+        reset_membership(db)
+        db.send_file(path, 'membership', mode=mode)
+        res = db.send_query(
+            'select id, membership is null as m, average is null as a '
+            'from membership where id > 1 order by id')
+        assert res.m.to_list() == [0, 1]
+        assert res.a.to_list() == [1, 0]
+
+
 @pytest.mark.usefixtures('db')
 class TestSendDataBehaviours:
     """Behaviours which are due to CSV and work for all modes."""
@@ -372,6 +554,23 @@ class TestSendDataBehaviours:
         assert self.is_na(df_in.membership[3])
         assert np.isnan(df_in.average[3])
 
+    def test_instrumentation(self, db):
+        """The phases of send_data are measured."""
+        reset(db)
+        collector = MetricsCollector()
+        db.instrumentation.add_hook(collector)
+        try:
+            db.send_data(
+                {'name': ['Chill'], 'owner': ['Alex'], 'birth': ['2018-03-03']},
+                'cats', mode='update')
+        finally:
+            db.instrumentation.hooks.remove(collector)
+        metrics = collector.metrics
+        phases = {phase for phase, _ in metrics}
+        assert {'frame', 'csv', 'infile', 'commit', 'send_data'} <= phases
+        assert metrics[('csv', None)]['rows'] == 1
+        assert metrics[('csv', None)]['bytes'] > 0
+
     @staticmethod
     def is_na(x):
         if x:
@@ -2,7 +2,12 @@
 We test send query specific features. Happy path functionality is covered in
 the send_data test suite.
 """
+import datetime
+import decimal
+
 import pytest
+from dbrequests.mysql import Database
+from dbrequests.mysql.tests.conftest import CREDS
 from dbrequests.mysql.tests.conftest import set_up_cats as reset
 
 
@@ -17,3 +22,99 @@ class TestSendQueryBehaviours:
         res.columns.values
         assert res.shape == (0, 4)
         assert all(res.columns.values == ['id', 'name', 'owner', 'birth'])
+
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_send_queries(self, db, executor):
+        """Parallel queries return results in order."""
+        reset(db)
+        queries = ['select * from cats where id = {}'.format(i)
+                   for i in (3, 1, 2)]
+        queries.append(('select name from cats', {'to_pandas': False}))
+        res = db.send_queries(queries, workers=2, executor=executor)
+        assert [df.name[0] for df in res[:3]] == ['Charlie', 'Sandy', 'Cookie']
+        assert res[3].shape == (3, 1)
+        assert not isinstance(res[3], type(res[0]))
+
+    def test_spill(self, db, tmp_path):
+        """Chunks are spilled to disk and the result is memory mapped."""
+        reset(db)
+        expected = db.send_query('select * from cats', to_pandas=False)
+        res = db.send_query(
+            'select * from cats', to_pandas=False, chunksize=1,
+            spill_dir=str(tmp_path), max_memory=0)
+        assert res.names == expected.names
+        assert res.to_list() == expected.to_list()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_bulk_convert(self):
+        """Dates and decimals are converted per column."""
+        from datatable import stype
+        with Database(CREDS.copy(), bulk_convert=True) as db:
+            reset(db)
+            res = db.send_query(
+                'select birth, cast(id as decimal(5, 2)) as x from cats',
+                to_pandas=False)
+            assert res.stypes == (stype.date32, stype.float64)
+            assert res[:, 'x'].to_list() == [[1.0, 2.0, 3.0]]
+            # Other paths keep the conversions of the driver.
+            assert db.fetch_scalar('select cast(1.5 as decimal(5, 2))') == decimal.Decimal('1.50')
+            assert db.fetch_scalar("select birth from cats where id = 1") == datetime.date(2015, 1, 3)
+
+    def test_to_arrow(self, db):
+        """Results can be returned as pyarrow Table."""
+        pa = pytest.importorskip('pyarrow')
+        reset(db)
+        res = db.send_query('select * from cats', to='arrow', chunksize=2)
+        assert isinstance(res, pa.Table)
+        assert res.column_names == ['id', 'name', 'owner', 'birth']
+        assert res.column('name').to_pylist() == ['Sandy', 'Cookie', 'Charlie']
+        assert res.schema.field('name').type == pa.string()
+
+    def test_categorical(self, db):
+        """Columns are dictionary encoded into pandas categories."""
+        reset(db)
+        res = db.send_query('select * from cats', categorical=['owner'], chunksize=2)
+        assert res.owner.dtype == 'category'
+        assert list(res.owner) == ['Lennon', 'Casey', 'River']
+        assert res.name.dtype == object
+
+    def test_send_query_to_file(self, db, tmp_path):
+        """The result is written chunk by chunk."""
+        from datatable import fread
+        reset(db)
+        path = str(tmp_path / 'cats.csv')
+        stats = db.send_query_to_file('select * from cats', path, chunksize=2)
+        assert stats['rows'] == 3
+        assert stats['bytes'] == (tmp_path / 'cats.csv').stat().st_size
+        res = fread(path)
+        assert res.names == ('id', 'name', 'owner', 'birth')
+        assert res[:, 'name'].to_list() == [['Sandy', 'Cookie', 'Charlie']]
+
+
+class TestSendQueryCache:
+    """Results of send_query are cached on disk."""
+
+    def test_cache_hit(self, tmp_path):
+        """A cached result is returned until the cache is cleared."""
+        with Database(CREDS.copy(), cache=str(tmp_path)) as db:
+            reset(db)
+            res = db.send_query('select * from cats')
+            db.send_bulk_query('delete from cats where id = 1')
+            assert db.send_query('select * from cats').equals(res)
+            frame = db.send_query('select * from cats', to_pandas=False)
+            assert frame.shape == (3, 4)
+            db._cache.clear()
+            assert db.send_query('select * from cats').shape == (2, 4)
+
+    @pytest.mark.parametrize('to', ['pandas', 'datatable', 'arrow', 'polars', 'pandas_arrow'])
+    def test_cache_formats(self, tmp_path, to):
+        """Every output format is cached and returned in its type."""
+        if to == 'polars':
+            pytest.importorskip('polars')
+        with Database(CREDS.copy(), cache=str(tmp_path)) as db:
+            reset(db)
+            res = db.send_query('select * from cats', to=to)
+            db.send_bulk_query('delete from cats where id = 1')
+            cached = db.send_query('select * from cats', to=to)
+            assert type(cached) is type(res)
+            assert cached.shape == res.shape
@@ -0,0 +1,167 @@
+"""Appending writers for query results, one chunk at a time."""
+
+import os
+import uuid
+from contextlib import contextmanager
+
+from .spill import Spill
+
+FORMATS = ('csv', 'jay', 'parquet')
+
+
+@contextmanager
+def writer(path, format=None):
+    """
+    Open a writer for path, the format defaults to the extension of path.
+
+    Chunks are written to a temporary file which replaces path on close; on
+    error it is removed.
+    """
+    format = format or os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in FORMATS:
+        raise ValueError('format must be one of {}, got {!r}'.format(FORMATS, format))
+    tmp_file = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    file = _WRITERS[format](tmp_file)
+    try:
+        yield file
+        os.replace(tmp_file, path)
+    finally:
+        file.discard()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+class CsvWriter(object):
+    """Appends chunks to a CSV file with a header."""
+
+    def __init__(self, path):
+        self.path = path
+        self._started = False
+
+    def write(self, chunk):
+        from datatable import f, str64
+
+        # Frame.to_csv can't process obj64 columns, e.g. decimals.
+        chunk = chunk[:, f[:].remove(f[:]).extend(str64(f[:]))][:, chunk.names]
+        chunk.to_csv(path=self.path, header=not self._started, append=self._started)
+        self._started = True
+
+    def close(self, names):
+        """Finish the file, returns its size in bytes."""
+        from datatable import Frame
+
+        if not self._started:
+            Frame({n: [] for n in names}).to_csv(path=self.path)
+        return os.path.getsize(self.path)
+
+    def discard(self):
+        pass
+
+
+class JayWriter(object):
+    """Collects chunks in parts next to the file and combines them on close."""
+
+    def __init__(self, path):
+        self.path = path
+        self._spill = Spill(os.path.dirname(os.path.abspath(path)))
+
+    def write(self, chunk):
+        self._spill.write([chunk])
+
+    def close(self, names):
+        """Finish the file, returns its size in bytes."""
+        from datatable import Frame
+
+        if self._spill.parts:
+            self._spill.to_jay([], self.path)
+        else:
+            Frame({n: [] for n in names}).to_jay(self.path)
+        return os.path.getsize(self.path)
+
+    def discard(self):
+        """Remove parts left over after an error."""
+        for part in self._spill.parts:
+            os.remove(part)
+        self._spill.parts = []
+
+
+class ParquetWriter(object):
+    """
+    Appends chunks as row groups to a Parquet file, requires pyarrow.
+
+    A column only holding NULL has no type yet, so chunks are held back
+    until every column has a type, or they hold more than pending_bytes.
+    Columns still without a type are written as strings.
+    """
+
+    pending_bytes = 64 * 2 ** 20
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._pending = []
+
+    def write(self, chunk):
+        table = chunk.to_arrow()
+        if self._writer is not None:
+            return self._write(table)
+        self._pending.append(table)
+        schema = self._schema()
+        if not _untyped(schema) or sum(table.nbytes for table in self._pending) > self.pending_bytes:
+            self._start(schema)
+
+    def close(self, names):
+        """Finish the file, returns its size in bytes."""
+        from datatable import Frame
+        from pyarrow import parquet
+
+        if self._writer is None and self._pending:
+            self._start(self._schema())
+        if self._writer is None:
+            parquet.write_table(Frame({n: [] for n in names}).to_arrow(), self.path)
+        else:
+            self._writer.close()
+            self._writer = None
+        return os.path.getsize(self.path)
+
+    def discard(self):
+        self._pending = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _schema(self):
+        # The first type other than null of each column.
+        import pyarrow as pa
+
+        fields = []
+        for i, field in enumerate(self._pending[0].schema):
+            types = [table.schema.field(i).type for table in self._pending]
+            fields.append(pa.field(field.name, next((t for t in types if t != pa.null()), pa.null())))
+        return pa.schema(fields)
+
+    def _start(self, schema):
+        import pyarrow as pa
+        from pyarrow import parquet
+
+        for name in _untyped(schema):
+            schema = schema.set(schema.get_field_index(name), pa.field(name, pa.string()))
+        self._writer = parquet.ParquetWriter(self.path, schema)
+        pending, self._pending = self._pending, []
+        for table in pending:
+            self._write(table)
+
+    def _write(self, table):
+        if table.schema != self._writer.schema:
+            # e.g. a column only holding NULL in this chunk.
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+
+def _untyped(schema):
+    import pyarrow as pa
+
+    return [field.name for field in schema if field.type == pa.null()]
+
+
+_WRITERS = {'csv': CsvWriter, 'jay': JayWriter, 'parquet': ParquetWriter}
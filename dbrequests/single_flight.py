@@ -0,0 +1,92 @@
+"""Deduplication of concurrent identical calls."""
+
+import threading
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key.
+
+    The first caller executes the function; callers arriving while it is
+    running wait and share its result, or its exception. When a result is
+    shared, every caller receives a copy: datatable Frames are copied lazily
+    (copy-on-write), pandas DataFrames are copied deeply.
+
+    Use `stats` to see how many calls have been coalesced.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._calls = 0
+        self._executions = 0
+
+    def __getstate__(self):
+        # Only the counters survive pickling; flights are local to a process.
+        return {'_calls': self._calls, '_executions': self._executions}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+    def __repr__(self):
+        return '<SingleFlight {}>'.format(self.stats)
+
+    @property
+    def stats(self):
+        """A dict with the number of calls, executions and coalesced calls."""
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'executions': self._executions,
+                'coalesced': self._calls - self._executions,
+                'in_flight': len(self._flights),
+            }
+
+    def do(self, key, function):
+        """Call function, unless a call with the same key is in flight."""
+        with self._lock:
+            self._calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._executions += 1
+            else:
+                flight.followers += 1
+        if leader:
+            try:
+                flight.result = function()
+            except BaseException as error:
+                flight.error = error
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                    shared = flight.followers > 0
+                flight.done.set()
+        else:
+            flight.done.wait()
+            shared = True
+        if flight.error is not None:
+            raise flight.error
+        if shared:
+            return _copy(flight.result)
+        return flight.result
+
+
+class _Flight(object):
+    """A call in flight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+        self.error = None
+
+
+def _copy(result):
+    copy = getattr(result, 'copy', None)
+    if copy is None:
+        return result
+    return copy()
@@ -0,0 +1,40 @@
+"""Testing the asyncio interface on SQLite."""
+
+import asyncio
+from contextlib import closing
+
+import pytest
+from dbrequests import AsyncDatabase
+from dbrequests.aio import DEFAULT_MAX_WORKERS, _Call
+from sqlalchemy.pool import QueuePool
+
+
+class TestAsyncDatabase:
+    def test_send_query(self):
+        with closing(AsyncDatabase('sqlite://')) as adb:
+            res = asyncio.run(adb.send_query('select 1 as x'))
+        assert res.x.to_list() == [1]
+
+    @pytest.mark.parametrize('kwargs, expected', [
+        ({}, DEFAULT_MAX_WORKERS),
+        ({'poolclass': QueuePool}, 14),
+        ({'poolclass': QueuePool, 'pool_size': 3, 'max_overflow': 2}, 4),
+        ({'poolclass': QueuePool, 'max_workers': 2}, 2),
+    ])
+    def test_max_workers(self, kwargs, expected):
+        """The workers are bounded by the pool of the engine."""
+        with closing(AsyncDatabase('sqlite://', **kwargs)) as adb:
+            assert adb._get_executor()._max_workers == expected
+
+    def test_cancel_before_connect(self):
+        """A call cancelled before it opens a connection sends nothing."""
+        with closing(AsyncDatabase('sqlite://')) as adb:
+            def create():
+                # cancelled while the worker is running, before it connects
+                adb._cancel(call)
+                return adb.database.send_bulk_query('create table t (x int)')
+
+            call = _Call(create, (), {})
+            assert adb._execute(call) is None
+            assert call.connections == []
+            assert 't' not in adb.database.get_table_names()
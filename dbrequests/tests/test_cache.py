@@ -0,0 +1,98 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+from dbrequests import QueryCache
+
+dt = pytest.importorskip('datatable')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryCache(str(tmp_path / 'cache'), ttl=60, max_size=None)
+
+
+class TestQueryCache:
+    def test_key(self):
+        key = QueryCache.key('url', 'select 1', {'a': 1, 'b': 2})
+        assert key == QueryCache.key('url', 'select 1', {'b': 2, 'a': 1})
+        assert key != QueryCache.key('url', 'select 2', {'a': 1, 'b': 2})
+        assert key != QueryCache.key('other', 'select 1', {'a': 1, 'b': 2})
+
+    def test_frame(self, cache):
+        frame = dt.Frame(x=[1, 2, 3], y=['a', None, 'c'])
+        assert cache.get('key') is None
+        cache.put('key', frame)
+        res = cache.get('key')
+        assert isinstance(res, dt.Frame)
+        assert res.to_list() == frame.to_list()
+        assert os.listdir(cache.path) == ['key.jay']
+
+    def test_data_frame(self, cache):
+        pytest.importorskip('pyarrow')
+        df = pd.DataFrame({'x': [1, 2, 3], 'y': ['a', None, 'c']})
+        cache.put('key', df)
+        res = cache.get('key')
+        assert isinstance(res, pd.DataFrame)
+        assert res.equals(df)
+
+    def test_arrow_table(self, cache):
+        pa = pytest.importorskip('pyarrow')
+        table = pa.table({'x': [1, 2, 3], 'y': ['a', None, 'c']})
+        cache.put('key', table)
+        res = cache.get('key')
+        assert isinstance(res, pa.Table)
+        assert res.equals(table)
+        assert os.listdir(cache.path) == ['key.arrow.parquet']
+
+    def test_polars(self, cache):
+        pl = pytest.importorskip('polars')
+        df = pl.DataFrame({'x': [1, 2, 3], 'y': ['a', None, 'c']})
+        cache.put('key', df)
+        res = cache.get('key')
+        assert isinstance(res, pl.DataFrame)
+        assert res.equals(df)
+
+    @pytest.mark.parametrize('value', [[(1, 'a')], iter([pd.DataFrame({'x': [1]})])])
+    def test_unsupported(self, cache, value):
+        """Records and iterators of chunks are not stored."""
+        cache.put('key', value)
+        assert cache.get('key') is None
+        assert os.listdir(cache.path) == []
+
+    def test_failed_write(self, cache):
+        """A failing write leaves no temporary file behind."""
+        class Broken(object):
+            def to_parquet(self, path):
+                open(path, 'w').close()
+                raise OSError('disk full')
+
+        with pytest.raises(OSError):
+            cache.put('key', Broken())
+        assert os.listdir(cache.path) == []
+
+    def test_ttl(self, cache):
+        cache.put('key', dt.Frame(x=[1]))
+        file = os.path.join(cache.path, 'key.jay')
+        created = time.time() - 61
+        os.utime(file, (created, created))
+        assert cache.get('key') is None
+        assert not os.path.exists(file)
+
+    def test_evict_least_recently_used(self, cache):
+        for key in ['a', 'b', 'c']:
+            cache.put(key, dt.Frame(x=range(1000)))
+        size = os.path.getsize(os.path.join(cache.path, 'a.jay'))
+        now = time.time()
+        for age, key in enumerate(['b', 'a', 'c']):
+            file = os.path.join(cache.path, key + '.jay')
+            os.utime(file, (now - age * 10, now))
+        cache.max_size = 2 * size
+        cache.put('d', dt.Frame(x=range(1000)))
+        assert sorted(os.listdir(cache.path)) == ['b.jay', 'd.jay']
+
+    def test_clear(self, cache):
+        cache.put('key', dt.Frame(x=[1]))
+        cache.clear()
+        assert os.listdir(cache.path) == []
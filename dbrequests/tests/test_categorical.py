@@ -0,0 +1,50 @@
+import pytest
+from dbrequests.mysql.categorical import Categorical, categorize
+
+dt = pytest.importorskip('datatable')
+pd = pytest.importorskip('pandas')
+
+
+class Cursor:
+    """Description and flags as reported by MySQLdb."""
+
+    description = [('id', 3), ('status', 254), ('country', 253), ('name', 253)]
+    description_flags = [0, 256, 0, 0]
+
+
+ROWS = [(i, 'new', 'DE' if i % 2 else None, 'cat{}'.format(i))
+        for i in range(100)]
+NAMES = ['id', 'status', 'country', 'name']
+
+
+class TestCategorical:
+    def test_columns(self):
+        encoder = Categorical(['country'])
+        encoder.describe(Cursor())
+        frame = dt.rbind(encoder.to_frame(ROWS[:50], NAMES),
+                         encoder.to_frame(ROWS[50:], NAMES))
+        df = encoder.to_pandas(frame)
+        assert df.country.dtype == 'category'
+        assert list(df.country.cat.categories) == ['DE']
+        assert df.country.isna().sum() == 50
+        assert df.name.dtype == object
+
+    def test_auto(self):
+        encoder = Categorical('auto')
+        encoder.describe(Cursor())
+        df = encoder.to_pandas(encoder.to_frame(ROWS, NAMES))
+        # status is an ENUM, country has few distinct values
+        assert sorted(encoder.categories) == ['country', 'status']
+        assert df.status.dtype == 'category'
+        assert df.name.dtype == object
+
+    def test_unknown_column(self):
+        with pytest.raises(ValueError):
+            Categorical('nope').describe(Cursor())
+
+    def test_categorize(self):
+        df = pd.DataFrame(ROWS, columns=NAMES)
+        res = categorize(df, 'auto')
+        assert res.status.dtype == 'category'
+        assert res.country.dtype == 'category'
+        assert res.name.dtype == object
@@ -0,0 +1,52 @@
+import pytest
+from dbrequests import Database
+
+pd = pytest.importorskip('pandas')
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database('sqlite:///{}'.format(tmp_path / 'test.db'))
+    db.send_bulk_query('create table cats (id integer primary key, name text)')
+    db.send_bulk_query("insert into cats values (1, 'Sandy'), (2, 'Cookie')")
+    yield db
+    db.close()
+
+
+def chunks(start, n=3):
+    for i in range(start, start + n):
+        yield pd.DataFrame({'id': [i], 'name': ['cat {}'.format(i)]})
+
+
+class TestSendChunks:
+    def test_insert(self, db):
+        db.send_data(chunks(3), 'cats')
+        assert db.fetch_scalar('select count(*) from cats') == 5
+
+    def test_list(self, db):
+        """A list of data frames is sent chunk by chunk, too."""
+        db.send_data(list(chunks(3)), 'cats')
+        assert db.fetch_scalar('select count(*) from cats') == 5
+
+    def test_truncate(self, db):
+        """Only the first chunk truncates the table."""
+        db.send_data(chunks(10), 'cats', 'truncate')
+        assert db.fetch_records('select id from cats order by id') == [
+            (10,), (11,), (12,)]
+
+    def test_rollback(self, db):
+        """A failing chunk rolls back the chunks sent before."""
+        with pytest.raises(Exception):
+            db.send_data(chunks(2), 'cats')
+        assert db.fetch_scalar('select count(*) from cats') == 2
+
+
+class TestQueryChunksize:
+    def test_send_query(self, db):
+        """chunksize is passed to pandas, which returns the chunks."""
+        res = db.send_query('select * from cats order by id', chunksize=1)
+        assert [chunk.id.tolist() for chunk in res] == [[1], [2]]
+
+    def test_incremental(self, db):
+        with pytest.raises(ValueError):
+            db.send_query_incremental('cats', watermark_col='id', chunksize=1)
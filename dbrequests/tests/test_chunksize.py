@@ -0,0 +1,21 @@
+import pytest
+from dbrequests.mysql import Connection
+
+dt = pytest.importorskip('datatable')
+
+
+class TestAdaptiveChunksize:
+    def test_row_width(self):
+        narrow = dt.Frame(x=list(range(1000)))
+        wide = dt.Frame([list(range(1000))] * 100)
+        chunk_memory = 2 ** 20
+        narrow_size = Connection._adapt_chunksize(narrow, 1000, chunk_memory)
+        wide_size = Connection._adapt_chunksize(wide, 1000, chunk_memory)
+        assert narrow_size > 50 * wide_size
+        assert narrow_size <= chunk_memory / 4
+        assert wide_size * 100 * 4 <= chunk_memory
+
+    def test_bounds(self):
+        frame = dt.Frame(x=range(1000))
+        assert Connection._adapt_chunksize(frame, 1000, 1) == 1000
+        assert Connection._adapt_chunksize(frame, 1000, 2 ** 40) == 1000000
@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+from dbrequests.mysql.converters import (NEWDECIMAL, ColumnConverter,
+                                         raw_conversions)
+from dbrequests.mysql.output import record_batch, to_frame
+
+dt = pytest.importorskip('datatable')
+
+DESCRIPTION = [
+    ('id', 3, None, 11, 11, 0, 0),
+    ('price', 246, None, 12, 10, 2, 1),
+    ('day', 10, None, 10, 10, 0, 1),
+    ('time', 12, None, 26, 26, 6, 1),
+    ('doc', 245, None, 0, 0, 0, 1),
+]
+NAMES = [column[0] for column in DESCRIPTION]
+ROWS = [(1, '1.50', '2020-01-02', '2020-01-02 10:11:12.5', '{"a": [1]}'),
+        (2, None, '0000-00-00', None, None)]
+
+
+class TestColumnConverter:
+    def test_frame(self):
+        frame = ColumnConverter(DESCRIPTION)(to_frame(ROWS, NAMES))
+        assert frame.names == tuple(NAMES)
+        assert frame.stypes == (dt.stype.int32, dt.stype.float64,
+                                dt.stype.date32, dt.stype.time64,
+                                dt.stype.obj64)
+        assert frame.to_list() == [
+            [1, 2], [1.5, None], [datetime.date(2020, 1, 2), None],
+            [datetime.datetime(2020, 1, 2, 10, 11, 12, 500000), None],
+            [{'a': [1]}, None]]
+
+    def test_record_batch(self):
+        pa = pytest.importorskip('pyarrow')
+        batch = ColumnConverter(DESCRIPTION)(record_batch(ROWS, NAMES))
+        assert batch.schema.field('price').type == pa.decimal128(10, 2)
+        assert batch.schema.field('day').type == pa.date32()
+        assert batch.column(2).to_pylist() == [datetime.date(2020, 1, 2), None]
+
+    def test_other_types_are_untouched(self):
+        frame = to_frame([(1, 'x')], ['id', 'name'])
+        converter = ColumnConverter([('id', 3), ('name', 253)])
+        assert converter(frame) is frame
+
+    @pytest.mark.parametrize('attribute', ['decoders', 'converter'])
+    def test_raw_conversions(self, attribute):
+        """pymysql has decoders, MySQLdb a converter; both are restored."""
+        original = {NEWDECIMAL: float, 3: int}
+        conn = type('DBAPIConnection', (object,), {})()
+        setattr(conn, attribute, original)
+        with raw_conversions(conn):
+            conv = getattr(conn, attribute)
+            assert conv.get(NEWDECIMAL) is not float
+            assert conv[3] is int
+        assert getattr(conn, attribute) is original
@@ -0,0 +1,44 @@
+import pytest
+from dbrequests import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    pytest.importorskip('sqlalchemy')
+    db = Database('sqlite:///{}'.format(tmp_path / 'test.db'))
+    db.send_bulk_query('create table cats (id integer primary key, name text)')
+    db.send_bulk_query("insert into cats values (1, 'Sandy'), (2, 'Cookie')")
+    yield db
+    db.close()
+
+
+class TestFastPath:
+    def test_fetch_records(self, db):
+        assert db.fetch_records('select * from cats order by id') == [
+            (1, 'Sandy'), (2, 'Cookie')]
+        assert db.fetch_records(
+            'select * from cats where id = :id', params={'id': 2},
+            as_dict=True) == [{'id': 2, 'name': 'Cookie'}]
+
+    def test_fetch_one(self, db):
+        assert db.fetch_one('select name from cats order by id') == ('Sandy',)
+        assert db.fetch_one('select * from cats where id < 0') is None
+
+    def test_fetch_scalar(self, db):
+        assert db.fetch_scalar('select count(*) from cats') == 2
+        assert db.fetch_scalar('select id from cats where id < 0') is None
+
+    def test_sql_file(self, db, tmp_path):
+        (tmp_path / 'count.sql').write_text(
+            'select count(*) from cats where id > {min_id}')
+        db.sql_dir = str(tmp_path)
+        assert db.fetch_scalar('count', min_id=1) == 1
+
+    def test_long_statements_not_cached(self, db):
+        from dbrequests.connection import _cached_text
+
+        _cached_text.cache_clear()
+        values = ', '.join('({}, {!r})'.format(i, 'cat') for i in range(3, 200))
+        db.send_bulk_query('insert into cats values {}'.format(values))
+        db.fetch_scalar('select count(*) from cats')
+        assert _cached_text.cache_info().currsize == 1
@@ -0,0 +1,38 @@
+"""
+Guard the imports of dbrequests against regressions: importing it and
+creating a Database loads none of the heavy dependencies. The import time is
+guarded in benchmarks/test_latency.py.
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ['pandas', 'sqlalchemy', 'datatable', 'pymysql', 'MySQLdb']
+
+SCRIPT = """
+import json
+import sys
+import time
+start = time.perf_counter()
+import {module}
+db = {module}.Database('mysql+pymysql://user:pw@localhost/db')
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'elapsed': elapsed,
+    'loaded': [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def run_import(module):
+    """Import module and instantiate a Database in a fresh interpreter."""
+    script = SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    out = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(out)
+
+
+@pytest.mark.parametrize('module', ['dbrequests', 'dbrequests.mysql'])
+class TestImport:
+    def test_no_heavy_imports(self, module):
+        assert run_import(module)['loaded'] == []
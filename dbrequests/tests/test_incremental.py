@@ -0,0 +1,109 @@
+import datetime
+
+import pytest
+from dbrequests import Database, FileState, TableState
+from dbrequests.incremental import incremental_query, literal, shift
+
+pytest.importorskip('pandas')
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database('sqlite:///{}'.format(tmp_path / 'test.db'), sql_dir=str(tmp_path))
+    db.send_bulk_query('create table cats (id integer primary key, name text, version integer)')
+    db.send_bulk_query("insert into cats values (1, 'Sandy', 1), (2, 'Cookie', 2)")
+    yield db
+    db.close()
+
+
+class TestIncremental:
+    def test_table(self, db):
+        assert len(db.send_query_incremental('cats', 'version')) == 2
+        assert len(db.send_query_incremental('cats', 'version')) == 0
+        db.send_bulk_query("insert into cats values (3, 'Charlie', 3)")
+        assert db.send_query_incremental('cats', 'version').name.to_list() == ['Charlie']
+
+    @pytest.mark.parametrize('state', ['file', 'table'])
+    def test_state(self, db, tmp_path, state):
+        def make_state():
+            if state == 'file':
+                return FileState(str(tmp_path / 'state.json'))
+            return TableState(db)
+
+        query = 'select * from cats where id > 0'
+        assert len(db.send_query_incremental(query, 'version', make_state())) == 2
+        # a new state object reads the persisted watermark
+        assert len(db.send_query_incremental(query, 'version', make_state())) == 0
+
+    def test_overlap(self, db):
+        db.send_query_incremental('cats', 'version')
+        assert db.send_query_incremental('cats', 'version', overlap=1).id.to_list() == [2]
+
+    def test_overlap_dates(self, db):
+        """Timestamps are strings in SQLite, unless they are parsed."""
+        db.send_bulk_query('create table dogs (id integer primary key, updated_at timestamp)')
+        db.send_bulk_query("insert into dogs values (1, '2020-01-01 10:00:00'), (2, '2020-01-01 11:00:00')")
+        db.send_query_incremental('dogs', 'updated_at')
+        with pytest.raises(ValueError):
+            db.send_query_incremental('dogs', 'updated_at', overlap=3600)
+        db.send_query_incremental('dogs', 'updated_at', name='parsed', parse_dates=['updated_at'])
+        res = db.send_query_incremental('dogs', 'updated_at', name='parsed', overlap=7200,
+                                        parse_dates=['updated_at'])
+        assert res.id.to_list() == [1, 2]
+
+    def test_cache(self, db, tmp_path):
+        cache = str(tmp_path / 'cats.jay')
+        with pytest.raises(ValueError):
+            db.send_query_incremental('cats', 'version', cache=cache)
+        db.send_query_incremental('cats', 'version', key='id', cache=cache)
+        db.send_bulk_query("update cats set name = 'Cookie Monster', version = 3 where id = 2")
+        res = db.send_query_incremental('cats', 'version', key='id', cache=cache)
+        assert res.name.to_list() == ['Sandy', 'Cookie Monster']
+
+    def test_sql_file(self, db, tmp_path):
+        (tmp_path / 'cats.sql').write_text('select id, version from cats where id > {min_id}')
+        assert db.send_query_incremental('cats', 'version', min_id=1).id.to_list() == [2]
+
+
+class TestHelpers:
+    def test_incremental_query(self):
+        assert incremental_query('db.cats', 'id', None) == 'select * from `db`.`cats`;'
+        assert incremental_query('select * from cats;', 'id', 3) == (
+            'select * from (select * from cats) as incremental where `id` > 3;')
+
+    def test_literal(self):
+        assert literal(datetime.datetime(2020, 1, 2, 3, 4, 5)) == "'2020-01-02 03:04:05.000000'"
+        assert literal("it's") == "'it''s'"
+        assert literal(None) == 'NULL'
+
+    def test_shift(self):
+        assert shift(datetime.datetime(2020, 1, 1, 1), 3600) == datetime.datetime(2020, 1, 1)
+        assert shift(10, 2) == 8
+        assert shift(None, 2) is None
+        assert shift('0042', None) == '0042'
+        with pytest.raises(ValueError):
+            shift('0042', 2)
+
+    def test_file_state(self, tmp_path):
+        state = FileState(str(tmp_path / 'state.json'))
+        assert state.get('cats') is None
+        for value in [datetime.datetime(2020, 1, 1, 12), datetime.date(2020, 1, 1), 42, 1.5, 'a']:
+            state.set('cats', value)
+            assert state.get('cats') == value
+
+    def test_file_state_failed_write(self, tmp_path, monkeypatch):
+        """A failing write leaves the state and no temporary file behind."""
+        import json
+
+        state = FileState(str(tmp_path / 'state.json'))
+        state.set('cats', 1)
+
+        def fail(*args, **kwargs):
+            raise OSError('disk full')
+
+        monkeypatch.setattr(json, 'dump', fail)
+        with pytest.raises(OSError):
+            state.set('cats', 2)
+        assert [path.name for path in tmp_path.iterdir()] == ['state.json']
+        monkeypatch.undo()
+        assert state.get('cats') == 1
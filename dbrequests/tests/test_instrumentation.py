@@ -0,0 +1,129 @@
+import logging
+import tracemalloc
+
+import pytest
+from dbrequests.instrumentation import (Event, Instrumentation,
+                                        MemoryBudgetExceeded,
+                                        MetricsCollector, current_rss,
+                                        fingerprint, normalize)
+
+
+class TestFingerprint:
+    def test_normalize(self):
+        query = """SELECT * FROM cats
+            WHERE id IN (1, 2, 3) AND name = 'Sandy' AND w > 1.5"""
+        assert normalize(query) == (
+            'select * from cats where id in (?) and name = ? and w > ?')
+
+    def test_identifiers_are_kept(self):
+        assert normalize('select `x1` from t2') == 'select `x1` from t2'
+
+    def test_fingerprint(self):
+        assert fingerprint('select 1') == fingerprint('SELECT  2')
+        assert fingerprint('select 1') != fingerprint('select 1 from cats')
+
+
+class TestInstrumentation:
+    def test_measure(self):
+        events = []
+        instrumentation = Instrumentation([events.append])
+        with instrumentation.measure('execute', 'select 1') as event:
+            event.rows = 1
+        assert len(events) == 1
+        assert events[0].phase == 'execute'
+        assert events[0].rows == 1
+        assert events[0].seconds > 0
+
+    def test_measure_error(self):
+        events = []
+        instrumentation = Instrumentation([events.append])
+        with pytest.raises(ValueError):
+            with instrumentation.measure('execute'):
+                raise ValueError()
+        assert isinstance(events[0].error, ValueError)
+
+
+class TestMemory:
+    @pytest.fixture
+    def instrumentation(self):
+        events = []
+        tracing = tracemalloc.is_tracing()
+        instrumentation = Instrumentation([events.append], track_memory=True)
+        instrumentation.events = events
+        yield instrumentation
+        if not tracing:
+            tracemalloc.stop()
+
+    def test_nested_peaks(self, instrumentation):
+        with instrumentation.measure('send_query'):
+            with instrumentation.measure('fetch'):
+                buffer = bytearray(10 ** 7)
+                del buffer
+            with instrumentation.measure('frame'):
+                pass
+        fetch, frame, send_query = instrumentation.events
+        assert fetch.memory >= 10 ** 7
+        assert frame.memory < 10 ** 6
+        # the peak of an inner phase is also the peak of the outer phase
+        assert send_query.memory >= 10 ** 7
+        assert send_query.rss > 0
+
+    def test_untracked(self):
+        events = []
+        with Instrumentation([events.append]).measure('fetch'):
+            pass
+        assert events[0].memory is None
+        assert events[0].rss is None
+
+    def test_budget(self):
+        instrumentation = Instrumentation(memory_budget=current_rss() * 10)
+        instrumentation.check_memory('fetch')
+        instrumentation.memory_budget = 1
+        with pytest.raises(MemoryBudgetExceeded, match='fetch'):
+            instrumentation.check_memory('fetch')
+        assert issubclass(MemoryBudgetExceeded, MemoryError)
+
+
+class TestMetricsCollector:
+    @pytest.fixture
+    def collector(self):
+        collector = MetricsCollector()
+        collector(Event('fetch', 'select 1', seconds=1.0, rows=10))
+        collector(Event('fetch', 'select 2', seconds=3.0, rows=20))
+        collector(Event('csv', 'cats', seconds=0.5, rows=5, bytes=100))
+        return collector
+
+    def test_aggregate(self, collector):
+        metrics = collector.metrics
+        assert metrics[('fetch', fingerprint('select 1'))] == {
+            'calls': 2, 'errors': 0, 'seconds': 4.0, 'max_seconds': 3.0,
+            'rows': 30, 'bytes': 0, 'max_memory': 0, 'max_rss': 0,
+            'status': {}}
+        assert collector.queries[fingerprint('cats')] == 'cats'
+
+    def test_prometheus(self, collector):
+        text = collector.to_prometheus()
+        assert '# TYPE dbrequests_seconds_total counter' in text
+        assert 'dbrequests_rows_total{{phase="fetch",fingerprint="{}"}} 30'.format(
+            fingerprint('select 1')) in text
+
+    def test_status(self, collector):
+        event = Event('server', 'select 1')
+        event.status = {'Handler_read_rnd_next': 5}
+        collector(event)
+        collector(event)
+        key = ('server', fingerprint('select 1'))
+        assert collector.metrics[key]['status'] == {'Handler_read_rnd_next': 10}
+        assert (
+            'dbrequests_server_status_total{{phase="server",fingerprint="{}",'
+            'variable="Handler_read_rnd_next"}} 10'.format(key[1])
+            in collector.to_prometheus())
+
+    def test_log(self, collector, caplog):
+        with caplog.at_level(logging.INFO, logger='dbrequests'):
+            collector.log()
+        assert len(caplog.records) == 2
+
+    def test_reset(self, collector):
+        collector.reset()
+        assert collector.metrics == {}
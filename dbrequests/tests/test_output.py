@@ -0,0 +1,46 @@
+import decimal
+
+import pytest
+from dbrequests.mysql.output import (concat_batches, from_frame,
+                                     output_format, record_batch)
+
+pa = pytest.importorskip('pyarrow')
+dt = pytest.importorskip('datatable')
+
+
+class TestOutputFormat:
+    def test_default(self):
+        params = {'to_pandas': False, 'chunksize': 1}
+        assert output_format(params) == 'datatable'
+        assert params == {'chunksize': 1}
+        assert output_format({}) == 'pandas'
+
+    def test_to(self):
+        assert output_format({'to': 'arrow', 'to_pandas': True}) == 'arrow'
+        with pytest.raises(ValueError):
+            output_format({'to': 'xml'})
+
+
+class TestArrow:
+    def test_concat_batches(self):
+        names = ['x', 'y']
+        batches = [
+            record_batch([(None, decimal.Decimal('1.5'))], names),
+            record_batch([(1, decimal.Decimal('10.25'))], names)]
+        table = concat_batches(batches, names)
+        assert table.column('x').to_pylist() == [None, 1]
+        assert table.column('y').to_pylist() == [
+            decimal.Decimal('1.5'), decimal.Decimal('10.25')]
+
+    def test_empty(self):
+        table = concat_batches([], ['x', 'y'])
+        assert table.column_names == ['x', 'y']
+        assert table.num_rows == 0
+
+    def test_strings_are_not_objects(self):
+        pd = pytest.importorskip('pandas')
+        if not hasattr(pd, 'ArrowDtype'):
+            pytest.skip('pandas < 1.5')
+        res = from_frame(dt.Frame(x=['a', 'b']), 'pandas_arrow')
+        assert str(res.x.dtype) == 'string[pyarrow]'
+        assert from_frame(dt.Frame(x=['a']), 'arrow').column_names == ['x']
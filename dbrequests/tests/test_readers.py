@@ -0,0 +1,49 @@
+import pytest
+from dbrequests.mysql.readers import csv_header, file_format, read_chunks, read_frame, slices
+
+dt = pytest.importorskip('datatable')
+
+
+@pytest.fixture
+def frame():
+    return dt.Frame(x=list(range(5)), y=['a', 'b,"c"', None, 'd', 'e'])
+
+
+class TestReader:
+    def test_file_format(self):
+        assert file_format('data.Parquet') == 'parquet'
+        assert file_format('data.txt', 'csv') == 'csv'
+        with pytest.raises(ValueError):
+            file_format('data.txt')
+
+    def test_csv_header(self, tmp_path, frame):
+        path = str(tmp_path / 'data.csv')
+        frame.to_csv(path)
+        assert csv_header(path) == ['x', 'y']
+
+    def test_jay_slices(self, tmp_path, frame):
+        path = str(tmp_path / 'data.jay')
+        frame.to_jay(path)
+        chunks = list(read_chunks(path, 'jay', rows=2))
+        assert [chunk.nrows for chunk in chunks] == [2, 2, 1]
+        assert dt.rbind(chunks).to_list() == frame.to_list()
+
+    def test_parquet_row_groups(self, tmp_path, frame):
+        parquet = pytest.importorskip('pyarrow.parquet')
+        path = str(tmp_path / 'data.parquet')
+        parquet.write_table(frame.to_arrow(), path, row_group_size=2)
+        assert [chunk.nrows for chunk in read_chunks(path, 'parquet')] == [2, 2, 1]
+        assert read_frame(path, 'parquet').to_list() == frame.to_list()
+
+    def test_empty_parquet(self, tmp_path, frame):
+        parquet = pytest.importorskip('pyarrow.parquet')
+        path = str(tmp_path / 'data.parquet')
+        parquet.write_table(frame[:0, :].to_arrow(), path)
+        chunks = list(read_chunks(path, 'parquet'))
+        assert len(chunks) == 1 and chunks[0].names == ('x', 'y')
+
+    def test_slices(self, frame):
+        df = frame.to_pandas()
+        assert [len(chunk) for chunk in slices(df, 2)] == [2, 2, 1]
+        assert slices(df, 5) is None
+        assert slices(frame, 2) is None
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from dbrequests.single_flight import SingleFlight
+
+
+def run_concurrently(single_flight, function, n=8):
+    """Call function n times via single_flight, while it is blocked."""
+    release = threading.Event()
+
+    def blocked():
+        release.wait()
+        return function()
+
+    with ThreadPoolExecutor(n) as pool:
+        futures = [pool.submit(single_flight.do, 'key', blocked)
+                   for _ in range(n)]
+        # wait until all calls have arrived before releasing the leader
+        while single_flight.stats['calls'] < n:
+            time.sleep(0.001)
+        release.set()
+    return futures
+
+
+class TestSingleFlight:
+    def test_coalesce(self):
+        sf = SingleFlight()
+        futures = run_concurrently(sf, lambda: pd.DataFrame({'x': [1, 2]}))
+        results = [future.result() for future in futures]
+        assert sf.stats == {
+            'calls': 8, 'executions': 1, 'coalesced': 7, 'in_flight': 0}
+        assert all(res.equals(results[0]) for res in results)
+        # every caller receives its own copy
+        results[0].loc[0, 'x'] = 100
+        assert results[1].x[0] == 1
+
+    def test_share_exception(self):
+        sf = SingleFlight()
+
+        def fail():
+            raise ValueError('boom')
+
+        futures = run_concurrently(sf, fail, n=4)
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+        assert sf.stats['in_flight'] == 0
+
+    def test_sequential_calls_are_not_coalesced(self):
+        sf = SingleFlight()
+        df = pd.DataFrame({'x': [1]})
+        assert sf.do('key', lambda: df) is df
+        assert sf.do('key', lambda: df) is df
+        assert sf.stats['executions'] == 2
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from dbrequests.mysql.snapshot import Snapshot, remove_keys
+
+dt = pytest.importorskip('datatable')
+
+
+class TestSnapshot:
+    def test_publish(self, tmp_path):
+        snapshot = Snapshot(str(tmp_path), 'db.cats')
+        assert not snapshot.load(['id', 'name'], 0)
+        snapshot.stage(dt.Frame(id=[1, 2], name=['a', 'b']))
+        # nothing is visible before the commit
+        assert not Snapshot(str(tmp_path), 'db.cats').load(['id', 'name'], 2)
+        snapshot.publish()
+        assert sorted(os.listdir(str(tmp_path))) == ['db.cats.jay', 'db.cats.json']
+
+        snapshot = Snapshot(str(tmp_path), 'db.cats')
+        assert snapshot.load(['id', 'name'], 2)
+        assert snapshot.frame.to_list() == [[1, 2], ['a', 'b']]
+        # other columns, rows or checksum
+        assert not snapshot.load(['id'], 2)
+        assert not snapshot.load(['id', 'name'], 3)
+        assert not snapshot.load(['id', 'name'], 2, checksum=123)
+
+    def test_checksum(self, tmp_path):
+        snapshot = Snapshot(str(tmp_path), 'cats', check='checksum')
+        snapshot.stage(dt.Frame(id=[1]))
+        snapshot.publish(checksum=123)
+        assert snapshot.load(['id'], 1, checksum=123)
+        with pytest.raises(ValueError):
+            Snapshot(str(tmp_path), 'cats', check='hash')
+
+    def test_discard(self, tmp_path):
+        snapshot = Snapshot(str(tmp_path), 'cats')
+        snapshot.stage(dt.Frame(id=[1]))
+        snapshot.discard()
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_publish_failure(self, tmp_path, monkeypatch):
+        """After the commit a failure invalidates the snapshot, nothing is raised."""
+        from dbrequests.mysql import Database
+
+        snapshot = Snapshot(str(tmp_path), 'cats')
+        snapshot.stage(dt.Frame(id=[1]))
+        snapshot.publish()
+        snapshot.stage(dt.Frame(id=[1, 2]))
+
+        def fail(checksum=None):
+            raise OSError('disk full')
+
+        monkeypatch.setattr(snapshot, 'publish', fail)
+        Database._publish_snapshots(Database.__new__(Database), [snapshot])
+        assert os.listdir(str(tmp_path)) == ['cats.jay']
+        assert not Snapshot(str(tmp_path), 'cats').load(['id'], 1)
+
+
+def test_remove_keys():
+    frame = dt.Frame(id=[1, 2, 3], name=['a', 'b', 'c'])
+    other = dt.Frame(id=[3, 1, 3], name=['x', 'y', 'z'])
+    assert remove_keys(frame, other, ['id']).to_list() == [[2], ['b']]
+    assert remove_keys(frame, other[:0, :], ['id']).to_list() == frame.to_list()
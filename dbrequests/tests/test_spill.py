@@ -0,0 +1,26 @@
+import os
+
+import pytest
+from dbrequests.mysql.spill import Spill
+
+dt = pytest.importorskip('datatable')
+
+
+class TestSpill:
+    def test_due(self, tmp_path):
+        chunks = [dt.Frame(x=range(1000))]
+        assert Spill(str(tmp_path)).due(chunks)
+        assert Spill(str(tmp_path), max_memory=100).due(chunks)
+        assert not Spill(str(tmp_path), max_memory=10 ** 6).due(chunks)
+
+    def test_frame(self, tmp_path):
+        spill = Spill(str(tmp_path / 'spill'))
+        chunks = [dt.Frame(x=[1, 2], y=['a', 'b']),
+                  dt.Frame(x=[None, 4], y=['c', None])]
+        spill.write(chunks)
+        assert chunks == []
+        assert len(os.listdir(spill.path)) == 2
+        frame = spill.frame([dt.Frame(x=[5], y=['e'])])
+        assert frame.to_list() == [[1, 2, None, 4, 5],
+                                   ['a', 'b', 'c', None, 'e']]
+        assert os.listdir(spill.path) == []
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+from dbrequests import Database, transfer
+
+pytest.importorskip('pandas')
+
+
+@pytest.fixture
+def src(tmp_path):
+    db = Database('sqlite:///{}'.format(tmp_path / 'src.db'))
+    db.send_bulk_query('create table cats (id integer primary key, name text)')
+    db.send_bulk_query('insert into cats values {}'.format(
+        ', '.join("({0}, 'cat {0}')".format(i) for i in range(1000))))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def dst(tmp_path):
+    db = Database('sqlite:///{}'.format(tmp_path / 'dst.db'))
+    db.send_bulk_query('create table cats (id integer primary key, name text)')
+    db.send_bulk_query("insert into cats values (-1, 'Sandy')")
+    yield db
+    db.close()
+
+
+class TestTransfer:
+    def test_transfer(self, src, dst):
+        stats = transfer(src, 'select * from cats', dst, 'cats', chunksize=100, buffer=2)
+        assert stats['rows'] == 1000
+        assert stats['rows_per_second'] > 0
+        assert dst.fetch_scalar('select count(*) from cats') == 1001
+
+    def test_truncate(self, src, dst):
+        transfer(src, 'select * from cats where id < 10', dst, 'cats', 'truncate')
+        assert dst.fetch_scalar('select min(id) from cats') == 0
+        assert dst.fetch_scalar('select count(*) from cats') == 10
+
+    def test_source_error(self, src, dst):
+        """Nothing is committed if the source fails."""
+        with pytest.raises(Exception):
+            transfer(src, 'select * from dogs', dst, 'cats', 'truncate')
+        assert dst.fetch_scalar('select count(*) from cats') == 1
+
+    def test_destination_error(self, src, dst):
+        """The source stops when the destination fails."""
+        threads = threading.active_count()
+        with pytest.raises(Exception):
+            transfer(src, 'select id, name, 1 as age from cats', dst, 'cats', chunksize=10, buffer=1)
+        assert threading.active_count() == threads
+        assert dst.fetch_scalar('select count(*) from cats') == 1
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from dbrequests.mysql.writers import writer
+
+dt = pytest.importorskip('datatable')
+
+
+def read(path):
+    if path.endswith('.parquet'):
+        return dt.Frame(pytest.importorskip('pandas').read_parquet(path))
+    return dt.fread(path)
+
+
+class TestWriter:
+    @pytest.mark.parametrize('format', ['csv', 'jay', 'parquet'])
+    def test_chunks(self, tmp_path, format):
+        if format == 'parquet':
+            pytest.importorskip('pyarrow')
+        path = str(tmp_path / ('res.' + format))
+        with writer(path) as file:
+            file.write(dt.Frame(x=[1, 2], y=['a', 'b']))
+            file.write(dt.Frame(x=[3], y=['c']))
+            assert file.close(['x', 'y']) == os.path.getsize(file.path)
+        assert os.listdir(str(tmp_path)) == ['res.' + format]
+        assert read(path).to_list() == [[1, 2, 3], ['a', 'b', 'c']]
+
+    @pytest.mark.parametrize('format', ['csv', 'jay', 'parquet'])
+    def test_null_first_chunk(self, tmp_path, format):
+        """A column only holding NULL in the first chunk gets its type later."""
+        if format == 'parquet':
+            pytest.importorskip('pyarrow')
+        path = str(tmp_path / ('res.' + format))
+        with writer(path) as file:
+            file.write(dt.Frame(x=[1, 2], y=[None, None], z=[None, None]))
+            file.write(dt.Frame(x=[3], y=['c'], z=[None]))
+            file.close(['x', 'y', 'z'])
+        res = read(path)
+        assert res['x'].to_list() == [[1, 2, 3]]
+        assert res[2, 'y'] == 'c'
+        assert res.nrows == 3
+
+    @pytest.mark.parametrize('format', ['csv', 'jay'])
+    def test_empty(self, tmp_path, format):
+        path = str(tmp_path / 'res')
+        with writer(path, format) as file:
+            file.close(['x', 'y'])
+        assert read(path).names == ('x', 'y')
+
+    def test_error(self, tmp_path):
+        path = str(tmp_path / 'res.jay')
+        with pytest.raises(ZeroDivisionError):
+            with writer(path) as file:
+                file.write(dt.Frame(x=[1]))
+                1 / 0
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            with writer(str(tmp_path / 'res.xlsx')):
+                pass
@@ -0,0 +1,114 @@
+"""Copy the result of a query from one database into a table of another."""
+
+import queue
+import threading
+import time
+
+# Marks the end of the chunks in the queue.
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """The destination failed, the source stops fetching."""
+
+
+def transfer(src_db, query, dst_db, table, mode='insert', chunksize=None, buffer=4, **params):
+    """
+    Copy the result of query in src_db into table in dst_db, chunk by chunk.
+
+    The source is read with a server side cursor in a thread, while the
+    destination sends the chunks it already has, see send_data with an
+    iterator. At most `buffer` chunks wait in between, so the memory needed
+    is bounded by the chunksize and not by the size of the table. On error
+    in either database nothing is committed in dst_db.
+
+    Args:
+    - src_db (Database): the database to read from.
+    - query (str): see send_query, params are passed to the query.
+    - dst_db (Database): the database to write to.
+    - table (str): the table in dst_db.
+    - mode (str): see send_data; modes needing all data at once, like
+      'sync_diffs', raise a ValueError.
+    - chunksize (int|None): rows per chunk, see send_query_chunks.
+    - buffer (int): the number of chunks fetched ahead.
+
+    Returns a dict with the number of rows, the seconds, the throughput in
+    rows per second and the seconds the source waited for the destination
+    ('source_blocked') and the destination for the source ('destination_blocked').
+    """
+    chunks = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+    errors = []
+    blocked = {'source': 0.0, 'destination': 0.0}
+    to_pandas = not _is_mysql(dst_db)
+
+    def put(chunk):
+        start = time.perf_counter()
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                chunks.put(chunk, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        blocked['source'] += time.perf_counter() - start
+
+    def produce():
+        try:
+            src_db.send_query_chunks(query, put, chunksize, **params)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            chunks.put(_DONE)
+
+    def consume():
+        rows = 0
+        while True:
+            start = time.perf_counter()
+            chunk = chunks.get()
+            blocked['destination'] += time.perf_counter() - start
+            if chunk is _DONE:
+                break
+            if to_pandas and hasattr(chunk, 'to_pandas'):
+                chunk = chunk.to_pandas()
+            rows += chunk.shape[0]
+            yield chunk
+        if errors:
+            # Raised within send_data, which rolls back.
+            raise errors[0]
+        result['rows'] = rows
+
+    result = {'rows': 0}
+    start = time.perf_counter()
+    with dst_db.instrumentation.measure('transfer', table) as event:
+        producer = threading.Thread(target=produce, name='dbrequests-transfer', daemon=True)
+        producer.start()
+        try:
+            dst_db.send_data(consume(), table, mode)
+        finally:
+            stop.set()
+            # Unblock the producer waiting for space, then wait for it.
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+        event.rows = result['rows']
+    seconds = time.perf_counter() - start
+    result.update({
+        'seconds': seconds,
+        'rows_per_second': result['rows'] / seconds,
+        'source_blocked': blocked['source'],
+        'destination_blocked': blocked['destination']})
+    return result
+
+
+def _is_mysql(db):
+    # dbrequests.mysql sends datatable Frames, dbrequests pandas DataFrames.
+    from dbrequests.mysql import Database
+
+    return isinstance(db, Database)